@@ -4,10 +4,24 @@ SAM 2 Video Segmentation Core Module
 Provides video-based segmentation with temporal propagation using Meta's SAM 2.
 """
 
-from .sam2_video_predictor import SAM2VideoPredictor, TrackedObject, VideoSession
+from .sam2_video_predictor import (
+    MaskStore,
+    SAM2RuntimeConfig,
+    SAM2VideoPredictor,
+    TrackedObject,
+    VideoSession,
+    mask_to_rle,
+    mask_to_rle_bytes,
+    rle_to_mask,
+)
 
 __all__ = [
+    "MaskStore",
+    "SAM2RuntimeConfig",
     "SAM2VideoPredictor",
     "VideoSession",
     "TrackedObject",
+    "mask_to_rle",
+    "mask_to_rle_bytes",
+    "rle_to_mask",
 ]
@@ -6,15 +6,33 @@ Unlike the original SAM which works frame-by-frame, SAM 2 propagates
 masks temporally across video frames with a memory mechanism.
 """
 
+import asyncio
+import atexit
+import contextlib
+import heapq
 import logging
 import os
+import queue
 import shutil
 import tempfile
+import threading
 import time
 import uuid
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    AsyncContextManager,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import cv2
 import numpy as np
@@ -23,6 +41,191 @@ from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# OPTIMIZATION: Let OpenCV (and its FFmpeg backend) decode with all available cores
+cv2.setNumThreads(os.cpu_count() or 1)
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "threads;auto")
+
+# Inference mode context held open on the thread that loaded the model
+_INFERENCE_CTX: Optional[torch.inference_mode] = None
+
+
+def _enter_global_inference_mode():
+    """
+    Enter torch.inference_mode() once for the calling thread.
+
+    Request handlers run on the same event loop thread that loads the model,
+    so this removes the per-call context manager from their hot paths.
+    Inference mode is thread-local: code running on worker threads must
+    still enter it explicitly.
+    """
+    global _INFERENCE_CTX
+    if _INFERENCE_CTX is not None:
+        return
+    _INFERENCE_CTX = torch.inference_mode()
+    _INFERENCE_CTX.__enter__()
+    atexit.register(_INFERENCE_CTX.__exit__, None, None, None)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a true/false environment variable"""
+    return os.getenv(name, str(default).lower()).lower() == "true"
+
+
+@dataclass(frozen=True)
+class SAM2RuntimeConfig:
+    """SAM 2 runtime tunables, read once from the environment at import time"""
+
+    memory_bank_size: int = 4  # SAM2_MEMORY_BANK_SIZE
+    max_mem_frames: int = 4  # SAM2_MAX_MEM_FRAMES
+    disable_postproc: bool = False  # SAM2_DISABLE_POSTPROC
+    quantize: bool = True  # SAM2_QUANTIZE (CPU only)
+    jpeg_quality: int = 85  # SAM2_JPEG_QUALITY
+    encoder_batch_size: int = 8  # SAM2_ENCODER_BATCH_SIZE (<= 1 disables pre-encoding)
+    hw_decode: bool = True  # SAM2_HW_DECODE (CUDA only)
+    debug_sync: bool = False  # SAM2_DEBUG_SYNC (explicit CUDA syncs for debugging)
+    autocast_dtype: str = "auto"  # SAM2_AUTOCAST_DTYPE: auto, bfloat16, float16 or none (CUDA only)
+    compile: bool = False  # SAM2_COMPILE (vos_optimized torch.compile build, CUDA only)
+
+    CURRENT: ClassVar["SAM2RuntimeConfig"]
+
+    @classmethod
+    def from_env(cls) -> "SAM2RuntimeConfig":
+        return cls(
+            memory_bank_size=int(os.getenv("SAM2_MEMORY_BANK_SIZE", "4")),
+            max_mem_frames=int(os.getenv("SAM2_MAX_MEM_FRAMES", "4")),
+            disable_postproc=_env_bool("SAM2_DISABLE_POSTPROC", False),
+            quantize=_env_bool("SAM2_QUANTIZE", True),
+            jpeg_quality=int(os.getenv("SAM2_JPEG_QUALITY", "85")),
+            encoder_batch_size=int(os.getenv("SAM2_ENCODER_BATCH_SIZE", "8")),
+            hw_decode=_env_bool("SAM2_HW_DECODE", True),
+            debug_sync=_env_bool("SAM2_DEBUG_SYNC", False),
+            autocast_dtype=os.getenv("SAM2_AUTOCAST_DTYPE", "auto").lower(),
+            compile=_env_bool("SAM2_COMPILE", False),
+        )
+
+
+SAM2RuntimeConfig.CURRENT = SAM2RuntimeConfig.from_env()
+
+
+def mask_to_rle(mask: np.ndarray) -> Dict[str, Any]:
+    """
+    Encode a binary mask as COCO-style uncompressed RLE.
+
+    Runs are counted in column-major order and always start with a run of
+    zeros, matching pycocotools' {"size": [h, w], "counts": [...]} layout.
+    """
+    h, w = mask.shape
+    return {"size": [h, w], "counts": _rle_counts(mask).tolist()}
+
+
+def mask_to_rle_bytes(mask: np.ndarray) -> bytes:
+    """Same runs as mask_to_rle, packed as little-endian uint32 for binary transports"""
+    return _rle_counts(mask).astype("<u4").tobytes()
+
+
+def _rle_counts(mask: np.ndarray) -> np.ndarray:
+    """Column-major run lengths of a binary mask, starting with a (possibly empty) zero run"""
+    pixels = np.asarray(mask, dtype=bool).ravel(order="F")
+
+    # Run boundaries are the positions where the pixel value changes
+    changes = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [pixels.size])))
+    if pixels.size and pixels[0]:
+        counts = np.concatenate(([0], counts))
+    return counts
+
+
+def rle_to_mask(rle: Dict[str, Any]) -> np.ndarray:
+    """Decode an RLE produced by mask_to_rle back into a (H, W) uint8 mask of 0/1"""
+    h, w = rle["size"]
+    counts = np.asarray(rle["counts"], dtype=np.int64)
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 1
+    return np.repeat(values, counts).reshape((h, w), order="F")
+
+
+def packbits_torch(bits: torch.Tensor) -> torch.Tensor:
+    """
+    Pack a [B, N] boolean tensor into [B, ceil(N/8)] uint8 on its own device.
+
+    Matches np.packbits (big-endian bit order, zero padded), so rows can be stored
+    or unpacked with NumPy after a much smaller device-to-host copy.
+    """
+    b, n = bits.shape
+    bits = bits.to(torch.uint8)
+    pad = (-n) % 8
+    if pad:
+        bits = torch.nn.functional.pad(bits, (0, pad))
+    weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=bits.device)
+    return (bits.view(b, -1, 8) * weights).sum(dim=2, dtype=torch.uint8)
+
+
+class MaskStore:
+    """
+    Bit-packed binary masks for every frame of one object.
+
+    OPTIMIZATION: One contiguous [N_frames, ceil(H*W/8)] uint8 array plus a has_mask
+    bitmap, instead of a dict of per-frame uint8 arrays. Masks take 8x less memory,
+    frame access is a row index, and whole-object reads (areas, stacks, export) run
+    vectorized.
+    """
+
+    def __init__(self, total_frames: int, height: int, width: int):
+        self.shape = (height, width)
+        self.packed = np.zeros((total_frames, (height * width + 7) // 8), dtype=np.uint8)
+        self.has_mask = np.zeros(total_frames, dtype=bool)
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        if mask.shape != self.shape:
+            raise ValueError(f"Mask shape {mask.shape} does not match store shape {self.shape}")
+        return np.packbits(mask.reshape(-1))
+
+    def set(self, frame_idx: int, mask: np.ndarray):
+        """Store a binary mask (any nonzero value is foreground) for a frame"""
+        self.packed[frame_idx] = self._pack(mask)
+        self.has_mask[frame_idx] = True
+
+    def set_many(self, frame_idxs: np.ndarray, mask: np.ndarray):
+        """Store the same binary mask for several frames with a single packbits pass"""
+        self.packed[frame_idxs] = self._pack(mask)
+        self.has_mask[frame_idxs] = True
+
+    def get(self, frame_idx: int) -> Optional[np.ndarray]:
+        """Unpack the mask for a frame as a (H, W) uint8 array of 0/1, or None"""
+        if not self.has_mask[frame_idx]:
+            return None
+        h, w = self.shape
+        return np.unpackbits(self.packed[frame_idx], count=h * w).reshape(h, w)
+
+    def set_packed(self, frame_idx: int, packed: np.ndarray):
+        """Store an already bit-packed row (np.packbits layout) for a frame"""
+        self.packed[frame_idx] = packed
+        self.has_mask[frame_idx] = True
+
+    def get_packed(self, frame_idx: int) -> Optional[np.ndarray]:
+        """Return the packed row for a frame without unpacking it, or None"""
+        if not self.has_mask[frame_idx]:
+            return None
+        return self.packed[frame_idx]
+
+    @property
+    def frames(self) -> np.ndarray:
+        """Indices of frames that currently hold a mask, in ascending order"""
+        return np.flatnonzero(self.has_mask)
+
+    def stack(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (frame indices, (n, H, W) uint8 stack of 0/1) for every stored mask"""
+        frame_idxs = self.frames
+        h, w = self.shape
+        bits = np.unpackbits(self.packed[frame_idxs], axis=1, count=h * w)
+        return frame_idxs, bits.reshape(-1, h, w)
+
+    def areas(self) -> np.ndarray:
+        """Foreground pixel count for every frame (0 where no mask is stored)"""
+        h, w = self.shape
+        bits = np.unpackbits(self.packed, axis=1, count=h * w)
+        return bits.sum(axis=1, dtype=np.int64)
+
 
 @dataclass
 class TrackedObject:
@@ -33,7 +236,47 @@ class TrackedObject:
     category: str = ""
     color: Tuple[int, int, int] = (255, 0, 0)  # RGB
     prompts: List[Dict[str, Any]] = field(default_factory=list)
-    masks: Dict[int, np.ndarray] = field(default_factory=dict)  # frame_idx -> mask
+    masks: Optional[MaskStore] = None  # Allocated per video by allocate_masks
+    mask_buf: Optional[np.ndarray] = field(default=None, repr=False)  # (H, W) refine output
+    mask_gpu_buf: Optional[torch.Tensor] = field(default=None, repr=False)  # (H, W) device bool
+
+    def allocate_masks(self, total_frames: int, height: int, width: int):
+        """Allocate packed mask storage for every frame of the video"""
+        self.masks = MaskStore(total_frames, height, width)
+        self.mask_buf = np.empty((height, width), dtype=np.uint8)
+
+    def set_mask(self, frame_idx: int, mask: np.ndarray):
+        """Store a binary mask for a frame as packed bits (8x smaller than uint8)"""
+        self.masks.set(frame_idx, mask)
+
+    def set_masks(self, frame_idxs: np.ndarray, mask: np.ndarray):
+        """Store the same binary mask for several frames"""
+        self.masks.set_many(frame_idxs, mask)
+
+    def get_mask(self, frame_idx: int) -> Optional[np.ndarray]:
+        """Unpack the mask for a frame as a (H, W) uint8 array of 0/1, or None"""
+        if self.masks is None:
+            return None
+        return self.masks.get(frame_idx)
+
+    def get_mask_stack(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (frame indices, (n, H, W) uint8 stack of 0/1) for every stored mask"""
+        if self.masks is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0, 0), dtype=np.uint8)
+        return self.masks.stack()
+
+    @property
+    def mask_frames(self) -> np.ndarray:
+        """Indices of frames that currently hold a mask, in ascending order"""
+        if self.masks is None:
+            return np.empty(0, dtype=np.int64)
+        return self.masks.frames
+
+    def mask_areas(self) -> np.ndarray:
+        """Foreground pixel count for every frame (0 where no mask is stored)"""
+        if self.masks is None:
+            return np.empty(0, dtype=np.int64)
+        return self.masks.areas()
 
 
 @dataclass
@@ -42,7 +285,7 @@ class VideoSession:
 
     session_id: str
     video_path: str
-    video_frames: List[np.ndarray]  # All frames loaded in memory
+    frames_array: np.ndarray  # All frames loaded in memory, contiguous [N, H, W, 3] RGB
     frame_width: int
     frame_height: int
     total_frames: int
@@ -52,10 +295,20 @@ class VideoSession:
     inference_state: Any = None  # SAM 2 inference state
     created_at: float = field(default_factory=time.time)
     last_accessed: float = field(default_factory=time.time)
+    mask_upload_buf: Optional[torch.Tensor] = None  # Pinned (H, W) bool staging for edited masks
+    mask_upload_event: Optional[Any] = None  # CUDA event marking the last upload from it
+    points_upload_buf: Optional[torch.Tensor] = None  # Pinned (MAX_PROMPT_POINTS, 2) float32
+    labels_upload_buf: Optional[torch.Tensor] = None  # Pinned (MAX_PROMPT_POINTS,) int32
+    prompt_upload_event: Optional[Any] = None  # CUDA event marking the last prompt upload
 
     def update_access_time(self):
         self.last_accessed = time.time()
 
+    @property
+    def video_frames(self) -> np.ndarray:
+        """Frames indexed by frame number (kept for list-style callers)"""
+        return self.frames_array
+
     @property
     def idle_time(self) -> float:
         return time.time() - self.last_accessed
@@ -101,6 +354,15 @@ class SAM2VideoPredictor:
         },
     }
 
+    # Number of raw frames resized per GPU interpolate call during video loading
+    GPU_RESIZE_BATCH = 16
+
+    # Decoded frames buffered between the decoder thread and the loader
+    DECODE_QUEUE_SIZE = 32
+
+    # Capacity of the per-session pinned prompt buffers (larger prompts skip staging)
+    MAX_PROMPT_POINTS = 64
+
     # Default colors for objects (RGB)
     OBJECT_COLORS = [
         (255, 0, 0),  # Red
@@ -147,10 +409,28 @@ class SAM2VideoPredictor:
         # SAM 2 model components
         self.predictor = None
         self._model_loaded = False
+        self._channels_last = False  # Image encoder runs in NHWC (set at model load)
+
+        # OPTIMIZATION: BF16/FP16 autocast for SAM 2 forward passes on CUDA
+        self._autocast_dtype = self._resolve_autocast_dtype()
+        if self._autocast_dtype is not None:
+            logger.info(f"SAM 2 autocast enabled ({self._autocast_dtype})")
 
         # Active sessions
         self.sessions: Dict[str, VideoSession] = {}
 
+        # Min-heap of (last_accessed, session_id) for expiry; stale entries are refreshed lazily
+        self._expiry_heap: List[Tuple[float, str]] = []
+
+        # Refinement clicks waiting to be flushed, keyed by (session_id, frame_idx, object_id),
+        # and the task draining each key while a decode is in flight
+        self._pending_refines: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+        self._refine_tasks: Dict[Tuple[str, int, int], asyncio.Task] = {}
+
+        # Pinned host staging buffer for GPU frame uploads, held only while a video loads
+        self._pinned_upload_buf: Optional[torch.Tensor] = None
+        self._pinned_upload_lock = threading.Lock()
+
     def _configure_pytorch_optimizations(self):
         """Configure PyTorch for optimal inference performance"""
         # Set thread counts based on available resources
@@ -207,22 +487,47 @@ class SAM2VideoPredictor:
 
         logger.info(f"Loading SAM 2 {self.model_size} model from {checkpoint_path}")
 
+        # OPTIMIZATION: vos_optimized torch.compiles the full model (SAM 2.1+, torch>=2.5.1)
+        compile_model = SAM2RuntimeConfig.CURRENT.compile and self.device.type == "cuda"
+        build_kwargs = {"vos_optimized": True} if compile_model else {}
+
         # Build the video predictor
-        self.predictor = build_sam2_video_predictor(
-            config_file=model_cfg["config"],
-            ckpt_path=str(checkpoint_path),
-            device=self.device,
-        )
+        try:
+            self.predictor = build_sam2_video_predictor(
+                config_file=model_cfg["config"],
+                ckpt_path=str(checkpoint_path),
+                device=self.device,
+                **build_kwargs,
+            )
+        except TypeError:
+            if not build_kwargs:
+                raise
+            logger.warning("Installed SAM 2 does not support vos_optimized, building without compile")
+            compile_model = False
+            self.predictor = build_sam2_video_predictor(
+                config_file=model_cfg["config"],
+                ckpt_path=str(checkpoint_path),
+                device=self.device,
+            )
 
         # OPTIMIZATION: Quantize model for CPU inference (2-4x faster, 75% less memory)
         if self.device.type == 'cpu':
-            quantize_enabled = os.getenv("SAM2_QUANTIZE", "true").lower() == "true"
-            if quantize_enabled:
+            if SAM2RuntimeConfig.CURRENT.quantize:
                 self.predictor = self._quantize_model(self.predictor)
 
         # OPTIMIZATION: Configure SAM2 for faster inference
         self._tune_sam2_performance()
 
+        # OPTIMIZATION: NHWC layout for the image encoder on Tensor Core GPUs
+        self._enable_channels_last()
+
+        # OPTIMIZATION: Stay in inference mode for the lifetime of the process
+        _enter_global_inference_mode()
+
+        # Pay the compile cost at startup instead of on the first user request
+        if compile_model:
+            self._warmup_model()
+
         logger.info("SAM 2 video predictor loaded successfully")
 
     async def _download_checkpoint(self, model_cfg: Dict[str, str]):
@@ -266,28 +571,82 @@ class SAM2VideoPredictor:
         try:
             # OPTIMIZATION 1: Reduce memory bank size (faster encoding, less memory)
             # Default is 7, reducing to 4 gives 30-40% speedup with minimal accuracy loss
-            memory_bank_size = int(os.getenv("SAM2_MEMORY_BANK_SIZE", "4"))
+            config = SAM2RuntimeConfig.CURRENT
+            memory_bank_size = config.memory_bank_size
             if hasattr(self.predictor, 'mem_every'):
                 self.predictor.mem_every = memory_bank_size
                 logger.info(f"SAM2 memory bank size set to {memory_bank_size} (lower = faster encoding)")
 
             # OPTIMIZATION 2: Reduce number of memory frames
             # Controls how many past frames are kept in memory for tracking
-            max_mem_frames = int(os.getenv("SAM2_MAX_MEM_FRAMES", "4"))
+            max_mem_frames = config.max_mem_frames
             if hasattr(self.predictor, 'max_obj_ptrs_in_encoder'):
                 self.predictor.max_obj_ptrs_in_encoder = max_mem_frames
                 logger.info(f"SAM2 max memory frames set to {max_mem_frames}")
 
             # OPTIMIZATION 3: Disable expensive post-processing (fill_holes)
             # This can save 10-20% time with minimal visual impact
-            disable_postproc = os.getenv("SAM2_DISABLE_POSTPROC", "false").lower() == "true"
-            if disable_postproc and hasattr(self.predictor, 'fill_hole_area'):
+            if config.disable_postproc and hasattr(self.predictor, 'fill_hole_area'):
                 self.predictor.fill_hole_area = 0  # Disable hole filling
                 logger.info("SAM2 post-processing (hole filling) disabled for speed")
 
         except Exception as e:
             logger.warning(f"SAM2 performance tuning failed: {e}, using defaults")
 
+    def _warmup_model(self):
+        """Run the image encoder once on a black frame to trigger compilation"""
+        try:
+            start_time = time.time()
+            image_size = getattr(self.predictor, "image_size", 1024)
+            dummy = torch.zeros((1, 3, image_size, image_size), device=self.device)
+            if self._channels_last:
+                dummy = dummy.contiguous(memory_format=torch.channels_last)
+            with torch.inference_mode(), self._autocast():
+                self.predictor.forward_image(dummy)
+            torch.cuda.synchronize()
+            logger.info(f"SAM 2 compiled model warmed up in {time.time() - start_time:.1f}s")
+        except Exception as e:
+            logger.warning(f"SAM 2 warmup failed: {e}")
+
+    def _enable_channels_last(self):
+        """Convert the image encoder to channels_last memory format on Volta+ GPUs"""
+        if self.device.type != "cuda" or not hasattr(self.predictor, "image_encoder"):
+            return
+        try:
+            major, _ = torch.cuda.get_device_capability(self.device)
+            if major < 7:
+                return
+            self.predictor.image_encoder = self.predictor.image_encoder.to(
+                memory_format=torch.channels_last
+            )
+            self._channels_last = True
+            logger.info("SAM2 image encoder converted to channels_last memory format")
+        except Exception as e:
+            logger.warning(f"channels_last conversion failed: {e}, using contiguous format")
+
+    def _resolve_autocast_dtype(self) -> Optional[torch.dtype]:
+        """Pick the reduced-precision dtype for SAM 2 forward passes, or None for FP32"""
+        if self.device.type != "cuda":
+            return None
+        name = SAM2RuntimeConfig.CURRENT.autocast_dtype
+        if name in ("none", "float32", "fp32", ""):
+            return None
+        if name == "auto":
+            # BF16 needs Ampere+; fall back to FP16 Tensor Cores on older GPUs
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        if name in ("bfloat16", "bf16"):
+            return torch.bfloat16
+        if name in ("float16", "fp16", "half"):
+            return torch.float16
+        logger.warning(f"Unknown SAM2_AUTOCAST_DTYPE '{name}', running in FP32")
+        return None
+
+    def _autocast(self):
+        """Autocast context for SAM 2 forward passes (no-op on CPU or when disabled)"""
+        if self._autocast_dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type="cuda", dtype=self._autocast_dtype)
+
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self._model_loaded
@@ -327,7 +686,7 @@ class SAM2VideoPredictor:
         session = VideoSession(
             session_id=session_id,
             video_path=video_path,
-            video_frames=frames,
+            frames_array=frames,
             frame_width=metadata["width"],
             frame_height=metadata["height"],
             total_frames=len(frames),
@@ -341,18 +700,20 @@ class SAM2VideoPredictor:
             session.inference_state = self.predictor.init_state(video_path=frames_dir)
 
         self.sessions[session_id] = session
+        heapq.heappush(self._expiry_heap, (session.last_accessed, session_id))
         logger.info(
             f"Created session {session_id} for video {video_path} ({len(frames)} frames)"
         )
 
         return session
 
-    def _extract_frames_to_dir(self, frames: List[np.ndarray], session_id: str) -> str:
+    def _extract_frames_to_dir(self, frames: np.ndarray, session_id: str) -> str:
         """Extract video frames to a temp directory as JPEGs for SAM 2 with optimizations"""
         # Create temp directory
         frames_dir = tempfile.mkdtemp(prefix=f"sam2_frames_{session_id}_")
 
         logger.info(f"Extracting {len(frames)} frames to {frames_dir}")
+        jpeg_quality = SAM2RuntimeConfig.CURRENT.jpeg_quality
 
         for i, frame in enumerate(frames):
             # SAM 2 expects frames named as sequential integers with leading zeros
@@ -360,7 +721,7 @@ class SAM2VideoPredictor:
             # Convert RGB to BGR for cv2.imwrite
             frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
             # OPTIMIZATION: Reduced JPEG quality from 95 to 85 (40-50% smaller files, minimal visual difference)
-            cv2.imwrite(frame_path, frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            cv2.imwrite(frame_path, frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
 
         logger.info(f"Extracted {len(frames)} frames to {frames_dir}")
         return frames_dir
@@ -390,22 +751,38 @@ class SAM2VideoPredictor:
 
     def cleanup_expired_sessions(self):
         """Remove sessions that have been idle for too long"""
-        expired = [
-            sid
-            for sid, session in self.sessions.items()
-            if session.idle_time > self.session_timeout
-        ]
-        for sid in expired:
-            logger.info(
-                f"Session {sid} expired (idle for {self.sessions[sid].idle_time:.0f}s)"
-            )
+        now = time.time()
+        cleaned = 0
+
+        # OPTIMIZATION: Only inspect heap entries old enough to have expired
+        while self._expiry_heap and self._expiry_heap[0][0] + self.session_timeout < now:
+            last_accessed, sid = heapq.heappop(self._expiry_heap)
+            session = self.sessions.get(sid)
+            if session is None:
+                continue  # Already closed
+
+            if session.last_accessed > last_accessed:
+                # Accessed since this entry was pushed; requeue with the live timestamp
+                heapq.heappush(self._expiry_heap, (session.last_accessed, sid))
+                continue
+
+            logger.info(f"Session {sid} expired (idle for {session.idle_time:.0f}s)")
             self.close_session(sid)
-        return len(expired)
+            cleaned += 1
+
+        return cleaned
 
     def _load_video_frames(
         self, video_path: str
-    ) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
         """Load video frames with safety limits to prevent memory exhaustion"""
+        # OPTIMIZATION: Decode with NVDEC on GPU hosts (falls back to OpenCV on failure)
+        if self.device.type == "cuda" and SAM2RuntimeConfig.CURRENT.hw_decode:
+            try:
+                return self._load_video_frames_cuda(video_path)
+            except Exception as e:
+                logger.warning(f"Hardware video decode failed: {e}, falling back to OpenCV")
+
         cap = cv2.VideoCapture(video_path)
 
         if not cap.isOpened():
@@ -416,6 +793,111 @@ class SAM2VideoPredictor:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames_in_video = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
+        scale_factor, new_width, new_height = self._compute_output_size(width, height)
+        self._check_frame_count(total_frames_in_video)
+
+        # OPTIMIZATION: On GPU, downsample in batches with a single interpolate call
+        resize_on_gpu = scale_factor < 1.0 and self.device.type == "cuda"
+
+        # OPTIMIZATION: Decode into one contiguous [N, H, W, 3] buffer instead of a list
+        frames = self._allocate_frames(total_frames_in_video, new_height, new_width)
+        pending = []  # Raw BGR frames waiting for a batched GPU resize
+        frame_count = 0  # Frames read from the video
+        stored = 0  # Frames written to the buffer
+
+        # OPTIMIZATION: Decode on a dedicated thread so resize/cvtColor overlap with decode
+        frame_queue: queue.Queue = queue.Queue(maxsize=self.DECODE_QUEUE_SIZE)
+        stop_decoding = threading.Event()
+        decoder = threading.Thread(
+            target=self._decode_frames,
+            args=(cap, frame_queue, stop_decoding),
+            name="video-decoder",
+            daemon=True,
+        )
+        decoder.start()
+
+        try:
+            while True:
+                frame = frame_queue.get()
+                if frame is None:
+                    break
+
+                # Additional safety check during loading
+                if frame_count >= self.max_video_frames:
+                    logger.warning(
+                        f"Stopped loading at {frame_count} frames (limit: {self.max_video_frames})"
+                    )
+                    break
+
+                frame_count += 1
+
+                if resize_on_gpu:
+                    pending.append(frame)
+                    if len(pending) >= self.GPU_RESIZE_BATCH:
+                        batch = self._resize_frames_gpu(pending, new_width, new_height)
+                        frames = self._ensure_capacity(frames, stored + len(batch))
+                        frames[stored : stored + len(batch)] = batch
+                        stored += len(batch)
+                        pending = []
+                    continue
+
+                # OPTIMIZATION: Downsample frame if needed (2-4x faster processing on 4K videos)
+                if scale_factor < 1.0:
+                    frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+                # Convert BGR to RGB directly into the frame buffer
+                frames = self._ensure_capacity(frames, stored + 1)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frames[stored])
+                stored += 1
+
+            if pending:
+                batch = self._resize_frames_gpu(pending, new_width, new_height)
+                frames = self._ensure_capacity(frames, stored + len(batch))
+                frames[stored : stored + len(batch)] = batch
+                stored += len(batch)
+        finally:
+            stop_decoding.set()
+            # Drain the queue so a decoder blocked on a full queue can exit
+            while decoder.is_alive():
+                try:
+                    frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            decoder.join()
+            cap.release()
+            # A full batch of source-resolution frames is ~400MB of page-locked
+            # memory at 4K; don't hold it between video loads
+            self._release_pinned_upload_buffer()
+
+        frames = frames[:stored]
+
+        metadata = {
+            "fps": fps,
+            "width": new_width,  # Use downsampled dimensions
+            "height": new_height,
+            "total_frames": len(frames),
+        }
+
+        logger.info(
+            f"Loaded {len(frames)} frames from {video_path} ({new_width}x{new_height} @ {fps}fps)"
+        )
+
+        return frames, metadata
+
+    @staticmethod
+    def _decode_frames(cap: cv2.VideoCapture, frame_queue: queue.Queue, stop: threading.Event):
+        """Read frames from a capture into a bounded queue, ending with None"""
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_queue.put(frame)
+        finally:
+            frame_queue.put(None)
+
+    def _compute_output_size(self, width: int, height: int) -> Tuple[float, int, int]:
+        """Calculate the downsampling scale and output size for a video"""
         # OPTIMIZATION: Calculate downsampling scale for large videos instead of rejecting them
         scale_factor = 1.0
         new_width, new_height = width, height
@@ -430,8 +912,10 @@ class SAM2VideoPredictor:
                 f"Video will be downsampled from {width}x{height} to {new_width}x{new_height} "
                 f"(scale: {scale_factor:.2f}) for optimal processing"
             )
+        return scale_factor, new_width, new_height
 
-        # Check frame count
+    def _check_frame_count(self, total_frames_in_video: int):
+        """Warn when a video has more frames than will be loaded"""
         if total_frames_in_video > self.max_video_frames:
             logger.warning(
                 f"Video has {total_frames_in_video} frames, which exceeds "
@@ -439,45 +923,126 @@ class SAM2VideoPredictor:
                 f"Only first {self.max_video_frames} frames will be loaded."
             )
 
-        frames = []
-        frame_count = 0
+    def _load_video_frames_cuda(
+        self, video_path: str
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Load video frames using NVDEC hardware decoding.
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        Frames are decoded straight into CUDA tensors, converted to RGB and
+        downsampled on the GPU, so the CPU never runs the codec or resize.
+        Requires torchaudio built with FFmpeg CUDA support.
+        """
+        from torchaudio.io import StreamReader
+
+        reader = StreamReader(video_path)
+        info = reader.get_src_stream_info(reader.default_video_stream)
 
-            # Additional safety check during loading
-            if frame_count >= self.max_video_frames:
+        fps = info.frame_rate
+        scale_factor, new_width, new_height = self._compute_output_size(info.width, info.height)
+        self._check_frame_count(info.num_frames)
+
+        reader.add_video_stream(
+            frames_per_chunk=self.GPU_RESIZE_BATCH,
+            decoder=f"{info.codec}_cuvid",
+            hw_accel=f"cuda:{self.device.index or 0}",
+        )
+
+        frames = self._allocate_frames(info.num_frames, new_height, new_width)
+        stored = 0
+        for (chunk,) in reader.stream():
+            remaining = self.max_video_frames - stored
+            if remaining <= 0:
                 logger.warning(
-                    f"Stopped loading at {frame_count} frames (limit: {self.max_video_frames})"
+                    f"Stopped loading at {stored} frames (limit: {self.max_video_frames})"
                 )
                 break
 
-            # OPTIMIZATION: Downsample frame if needed (2-4x faster processing on 4K videos)
+            batch = self._yuv_to_rgb(chunk[:remaining])
             if scale_factor < 1.0:
-                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
-
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame_rgb)
-            frame_count += 1
+                batch = torch.nn.functional.interpolate(
+                    batch, size=(new_height, new_width), mode="area"
+                )
+            batch = batch.round_().clamp_(0, 255).to(torch.uint8)
+            batch = batch.permute(0, 2, 3, 1).contiguous().cpu().numpy()
+            frames = self._ensure_capacity(frames, stored + len(batch))
+            frames[stored : stored + len(batch)] = batch
+            stored += len(batch)
 
-        cap.release()
+        frames = frames[:stored]
 
         metadata = {
             "fps": fps,
-            "width": new_width,  # Use downsampled dimensions
+            "width": new_width,
             "height": new_height,
             "total_frames": len(frames),
         }
 
         logger.info(
-            f"Loaded {len(frames)} frames from {video_path} ({new_width}x{new_height} @ {fps}fps)"
+            f"Loaded {len(frames)} frames from {video_path} with NVDEC "
+            f"({new_width}x{new_height} @ {fps}fps)"
         )
 
         return frames, metadata
 
+    @staticmethod
+    def _yuv_to_rgb(frames: torch.Tensor) -> torch.Tensor:
+        """Convert NVDEC YUV444 frames [T,3,H,W] uint8 to RGB float in [0, 255]"""
+        frames = frames.float()
+        y = frames[:, 0]
+        u = frames[:, 1] - 128.0
+        v = frames[:, 2] - 128.0
+        r = y + 1.14 * v
+        g = y - 0.396 * u - 0.581 * v
+        b = y + 2.029 * u
+        return torch.stack([r, g, b], dim=1)
+
+    def _allocate_frames(self, expected_frames: int, height: int, width: int) -> np.ndarray:
+        """Preallocate contiguous [N, H, W, 3] storage for a video's frames"""
+        n = min(max(expected_frames, 0), self.max_video_frames)
+        return np.empty((n, height, width, 3), dtype=np.uint8)
+
+    def _ensure_capacity(self, frames: np.ndarray, required: int) -> np.ndarray:
+        """Grow frame storage when the container under-reported its frame count"""
+        if required <= len(frames):
+            return frames
+        capacity = min(max(required, 2 * len(frames)), self.max_video_frames)
+        grown = np.empty((capacity,) + frames.shape[1:], dtype=frames.dtype)
+        grown[: len(frames)] = frames
+        return grown
+
+    def _resize_frames_gpu(
+        self, frames: List[np.ndarray], width: int, height: int
+    ) -> np.ndarray:
+        """Downsample a batch of BGR frames on the GPU and return them as [B, H, W, 3] RGB"""
+        with self._pinned_upload_lock:
+            # OPTIMIZATION: Copy frames straight into pinned memory (no np.stack temporary)
+            # so the host-to-device transfer is a single async DMA.
+            staging = self._get_pinned_upload_buffer(frames[0].shape)[: len(frames)]
+            staging_np = staging.numpy()
+            for i, frame in enumerate(frames):
+                staging_np[i] = frame
+            batch = staging.to(self.device, non_blocking=True)
+
+            # NHWC BGR -> NCHW RGB
+            batch = batch.permute(0, 3, 1, 2).flip(1).float()
+            batch = torch.nn.functional.interpolate(batch, size=(height, width), mode="area")
+            batch = batch.round_().clamp_(0, 255).to(torch.uint8)
+            # The blocking device-to-host copy also guarantees the staging buffer is free
+            return batch.permute(0, 2, 3, 1).contiguous().cpu().numpy()
+
+    def _get_pinned_upload_buffer(self, frame_shape: Tuple[int, ...]) -> torch.Tensor:
+        """Return a pinned [GPU_RESIZE_BATCH, H, W, 3] uint8 buffer for the given frame shape"""
+        shape = (self.GPU_RESIZE_BATCH,) + tuple(frame_shape)
+        if self._pinned_upload_buf is None or tuple(self._pinned_upload_buf.shape) != shape:
+            self._pinned_upload_buf = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+        return self._pinned_upload_buf
+
+    def _release_pinned_upload_buffer(self) -> None:
+        """Free the pinned staging buffer once a video has finished loading"""
+        with self._pinned_upload_lock:
+            self._pinned_upload_buf = None
+
     # Object Tracking
 
     def add_object(
@@ -485,8 +1050,8 @@ class SAM2VideoPredictor:
         session_id: str,
         frame_idx: int,
         object_id: int,
-        points: List[Tuple[float, float]],
-        labels: List[int],
+        points: Union[np.ndarray, Sequence[Tuple[float, float]]],
+        labels: Union[np.ndarray, Sequence[int]],
         name: str = "",
         category: str = "",
     ) -> Dict[str, Any]:
@@ -497,8 +1062,8 @@ class SAM2VideoPredictor:
             session_id: Session ID
             frame_idx: Frame index where the object is visible
             object_id: Unique ID for this object
-            points: List of (x, y) coordinates
-            labels: List of labels (1 for positive/include, 0 for negative/exclude)
+            points: (N, 2) float32 array (or list) of (x, y) coordinates
+            labels: (N,) array (or list) of labels (1 for positive/include, 0 for negative/exclude)
             name: Optional name for the object (e.g., "Forceps")
             category: Optional category (e.g., "Instrument")
 
@@ -512,6 +1077,10 @@ class SAM2VideoPredictor:
         if frame_idx < 0 or frame_idx >= session.total_frames:
             raise ValueError(f"Invalid frame index: {frame_idx}")
 
+        # OPTIMIZATION: No-copy when the caller already passes float32/int32 arrays
+        points_np = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        labels_np = np.asarray(labels, dtype=np.int32).reshape(-1)
+
         # Create tracked object
         color_idx = len(session.objects) % len(self.OBJECT_COLORS)
         tracked_object = TrackedObject(
@@ -522,48 +1091,42 @@ class SAM2VideoPredictor:
             prompts=[
                 {
                     "frame_idx": frame_idx,
-                    "points": points,
-                    "labels": labels,
+                    "points": points_np,
+                    "labels": labels_np,
                     "type": "initial",
                 }
             ],
         )
-
-        # Convert points to numpy arrays for SAM 2
-        points_np = np.array(points, dtype=np.float32)
-        labels_np = np.array(labels, dtype=np.int32)
+        tracked_object.allocate_masks(
+            session.total_frames, session.frame_height, session.frame_width
+        )
 
         # Add to SAM 2 inference state
         if self.predictor is not None and session.inference_state is not None:
-            # OPTIMIZATION: Use inference_mode for faster execution without gradients
-            with torch.inference_mode():
-                # Add object with point prompts
+            points_in, labels_in = self._prompts_to_device(session, points_np, labels_np)
+            # Add object with point prompts
+            with self._autocast():
                 _, out_obj_ids, out_mask_logits = self.predictor.add_new_points_or_box(
                     inference_state=session.inference_state,
                     frame_idx=frame_idx,
                     obj_id=object_id,
-                    points=points_np,
-                    labels=labels_np,
+                    points=points_in,
+                    labels=labels_in,
                 )
 
-                # Force synchronization to ensure tensor operations complete (critical for low-CPU systems)
-                if torch.cuda.is_available():
-                    torch.cuda.synchronize()
-
-                # Convert logits to binary mask with validation
-                mask_tensor = (out_mask_logits[0] > 0.0).cpu()
-                mask = mask_tensor.numpy().squeeze().astype(np.uint8)
-
-                # Validate mask for corruption
-                if np.isnan(mask).any():
-                    logger.error(f"Corrupted mask detected for object {object_id}, frame {frame_idx}! Using empty mask.")
-                    mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+            # Validate logits for corruption (NaN cannot survive thresholding)
+            if torch.isnan(out_mask_logits[0]).any().item():
+                logger.error(f"Corrupted mask detected for object {object_id}, frame {frame_idx}! Using empty mask.")
+                mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+            else:
+                # OPTIMIZATION: Threshold and cast on device, single copy to host
+                mask = (out_mask_logits[0, 0] > 0.0).to(torch.uint8).cpu().numpy()
 
-            tracked_object.masks[frame_idx] = mask
+            tracked_object.set_mask(frame_idx, mask)
         else:
             # Simulation mode - create simple circular mask
-            mask = self._simulate_mask(session, points, labels)
-            tracked_object.masks[frame_idx] = mask
+            mask = self._simulate_mask(session, points_np, labels_np)
+            tracked_object.set_mask(frame_idx, mask)
 
         session.objects[object_id] = tracked_object
 
@@ -615,14 +1178,16 @@ class SAM2VideoPredictor:
             color=self.OBJECT_COLORS[color_idx],
             prompts=[{"frame_idx": frame_idx, "box": box, "type": "initial_box"}],
         )
+        tracked_object.allocate_masks(
+            session.total_frames, session.frame_height, session.frame_width
+        )
 
         # Convert box to numpy array for SAM 2
         box_np = np.array(box, dtype=np.float32)
 
         # Add to SAM 2 inference state
         if self.predictor is not None and session.inference_state is not None:
-            # OPTIMIZATION: Use inference_mode for faster execution
-            with torch.inference_mode():
+            with self._autocast():
                 _, out_obj_ids, out_mask_logits = self.predictor.add_new_points_or_box(
                     inference_state=session.inference_state,
                     frame_idx=frame_idx,
@@ -630,23 +1195,18 @@ class SAM2VideoPredictor:
                     box=box_np,
                 )
 
-                # Force synchronization
-                if torch.cuda.is_available():
-                    torch.cuda.synchronize()
-
-                # Convert with validation
-                mask_tensor = (out_mask_logits[0] > 0.0).cpu()
-                mask = mask_tensor.numpy().squeeze().astype(np.uint8)
-
-                if np.isnan(mask).any():
-                    logger.error(f"Corrupted mask detected for box object {object_id}, frame {frame_idx}!")
-                    mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+            # Validate logits, then threshold and cast on device
+            if torch.isnan(out_mask_logits[0]).any().item():
+                logger.error(f"Corrupted mask detected for box object {object_id}, frame {frame_idx}!")
+                mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+            else:
+                mask = (out_mask_logits[0, 0] > 0.0).to(torch.uint8).cpu().numpy()
 
-            tracked_object.masks[frame_idx] = mask
+            tracked_object.set_mask(frame_idx, mask)
         else:
             # Simulation mode
             mask = self._simulate_box_mask(session, box)
-            tracked_object.masks[frame_idx] = mask
+            tracked_object.set_mask(frame_idx, mask)
 
         session.objects[object_id] = tracked_object
 
@@ -665,6 +1225,7 @@ class SAM2VideoPredictor:
         start_frame: Optional[int] = None,
         end_frame: Optional[int] = None,
         direction: str = "both",  # "forward", "backward", or "both"
+        include_frames: bool = True,
     ) -> Dict[str, Any]:
         """
         Propagate masks from annotated frames to all other frames.
@@ -674,9 +1235,50 @@ class SAM2VideoPredictor:
             start_frame: Optional start frame (default: 0)
             end_frame: Optional end frame (default: last frame)
             direction: Propagation direction
+            include_frames: Return the masks; when False they are only stored
+                on the session (read them back with get_frame_masks)
 
         Returns:
-            Dictionary with all frame masks for all objects
+            Dictionary with all frame masks for all objects, RLE encoded
+            (see mask_to_rle), under "frames" when include_frames is set
+        """
+        frames = {}
+        frame_count = 0
+        for frame_idx, frame_masks in self.iter_propagate_masks(
+            session_id, start_frame, end_frame, direction
+        ):
+            frame_count += 1
+            if include_frames:
+                # OPTIMIZATION: Return masks run-length encoded (binary masks compress 50-200x)
+                frames[frame_idx] = {
+                    obj_id: mask_to_rle(mask) for obj_id, mask in frame_masks.items()
+                }
+
+        session = self.sessions[session_id]
+        result = {
+            "session_id": session_id,
+            "total_frames": session.total_frames,
+            "propagated_frames": frame_count,
+            "object_ids": list(session.objects.keys()),
+        }
+        if include_frames:
+            result["frames"] = frames
+        return result
+
+    def iter_propagate_masks(
+        self,
+        session_id: str,
+        start_frame: Optional[int] = None,
+        end_frame: Optional[int] = None,
+        direction: str = "both",  # "forward", "backward", or "both"
+    ) -> Iterator[Tuple[int, Dict[int, np.ndarray]]]:
+        """
+        Propagate masks frame by frame, yielding (frame_idx, {object_id: mask}).
+
+        Masks are stored on the session's tracked objects before each frame is
+        yielded, so callers can stream results without holding the whole video
+        in memory. The generator must be consumed on a single thread
+        (inference mode is thread-local).
         """
         session = self.get_session(session_id)
         if not session:
@@ -688,17 +1290,8 @@ class SAM2VideoPredictor:
         start_frame = start_frame or 0
         end_frame = end_frame or session.total_frames - 1
 
-        results = {
-            "session_id": session_id,
-            "total_frames": session.total_frames,
-            "object_ids": list(session.objects.keys()),
-            "frames": {},
-        }
-
         if self.predictor is not None and session.inference_state is not None:
             # Use SAM 2's video propagation with optimizations
-            video_segments = {}
-
             logger.info(
                 f"Starting mask propagation for session {session_id} "
                 f"({session.total_frames} frames, {len(session.objects)} objects)"
@@ -709,8 +1302,27 @@ class SAM2VideoPredictor:
             start_time = time.time()
             frame_count = 0
 
-            # OPTIMIZATION: Use inference_mode for entire propagation
-            with torch.inference_mode():
+            # OPTIMIZATION: Keep per-frame bookkeeping off the hot path. The clock is only
+            # read every 50 frames, and log messages are formatted lazily.
+            info_enabled = logger.isEnabledFor(logging.INFO)
+            now = start_time
+
+            pack_on_device = self.device.type == "cuda"
+            # OPTIMIZATION: Encode upcoming frames in mini-batches (GPU only, where
+            # per-frame encoding is launch-bound), keeping only a bounded look-ahead
+            prefetch = pack_on_device and SAM2RuntimeConfig.CURRENT.encoder_batch_size > 1
+            mask_hw = (session.frame_height, session.frame_width)
+            mask_pixels = session.frame_height * session.frame_width
+
+            # Pinned landing buffers for the per-frame device-to-host copy (reused every frame)
+            host_packed: Optional[torch.Tensor] = None
+            host_corrupted: Optional[torch.Tensor] = None
+            copy_done = torch.cuda.Event() if pack_on_device else None
+
+            # OPTIMIZATION: Use inference_mode for entire propagation. Propagation runs on a
+            # job worker thread, and inference mode is thread-local, so the global context
+            # entered at model load does not apply here.
+            with torch.inference_mode(), self._autocast():
                 for (
                     out_frame_idx,
                     out_obj_ids,
@@ -721,50 +1333,86 @@ class SAM2VideoPredictor:
                     # Store masks for each object in this frame
                     frame_masks = {}
 
-                    # OPTIMIZATION: Vectorized mask conversion (process all objects at once)
-                    mask_tensors = (out_mask_logits > 0.0).cpu()
+                    # OPTIMIZATION: Vectorized mask conversion (process all objects at once).
+                    # On CUDA, thresholding, the NaN check and bit packing all stay on the GPU
+                    # so only 1/8 of the bytes cross PCIe, and both results land in pinned
+                    # host buffers through async copies with a single wait per frame.
+                    mask_bits = out_mask_logits[:, 0] > 0.0
+                    # One NaN reduction per frame on the raw logits
+                    corrupted_dev = torch.isnan(out_mask_logits).flatten(1).any(dim=1)
+                    if pack_on_device:
+                        packed_dev = packbits_torch(mask_bits.flatten(1))
+                        n_obj = packed_dev.shape[0]
+                        if host_packed is None or host_packed.shape[0] < n_obj:
+                            host_packed = torch.empty(
+                                packed_dev.shape, dtype=torch.uint8, pin_memory=True
+                            )
+                            host_corrupted = torch.empty((n_obj,), dtype=torch.bool, pin_memory=True)
+                        host_packed[:n_obj].copy_(packed_dev, non_blocking=True)
+                        host_corrupted[:n_obj].copy_(corrupted_dev, non_blocking=True)
+                        copy_done.record()
+                        copy_done.synchronize()
+                        packed_rows = host_packed[:n_obj].numpy()
+                        corrupted = host_corrupted[:n_obj].numpy()
+                    else:
+                        mask_arrays = mask_bits.to(torch.uint8).cpu().numpy()
+                        corrupted = corrupted_dev.cpu().numpy()
 
                     for i, obj_id in enumerate(out_obj_ids):
-                        mask = mask_tensors[i].numpy().squeeze().astype(np.uint8)
+                        packed = None
+                        if pack_on_device:
+                            packed = packed_rows[i]
+                            mask = np.unpackbits(packed, count=mask_pixels).reshape(mask_hw)
+                        else:
+                            mask = mask_arrays[i]
 
                         # Validate mask for corruption
-                        if np.isnan(mask).any():
+                        if corrupted[i]:
                             logger.error(f"Corrupted mask at frame {out_frame_idx}, object {obj_id}! Using empty mask.")
                             mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+                            packed = None
 
-                        # Update the tracked object's masks
+                        # Update the tracked object's masks (already packed when done on device)
                         if obj_id in session.objects:
-                            session.objects[obj_id].masks[out_frame_idx] = mask
+                            if packed is not None:
+                                session.objects[obj_id].masks.set_packed(out_frame_idx, packed)
+                            else:
+                                session.objects[obj_id].set_mask(out_frame_idx, mask)
 
                         frame_masks[int(obj_id)] = mask
 
-                    video_segments[out_frame_idx] = frame_masks
+                    if prefetch:
+                        self._prefetch_image_features(session, out_frame_idx, end_frame)
+
+                    yield out_frame_idx, frame_masks
                     frame_count += 1
 
                     # Log when encoding phase completes (first frame indicates encoding is done)
                     if frame_count == 1:
-                        encoding_time = time.time() - start_time
-                        logger.info(
-                            f"Phase 1 complete: Frame encoding finished in {encoding_time:.1f}s. "
-                            f"Starting Phase 2: Mask propagation..."
-                        )
+                        now = time.time()
+                        if info_enabled:
+                            logger.info(
+                                "Phase 1 complete: Frame encoding finished in %.1fs. "
+                                "Starting Phase 2: Mask propagation...",
+                                now - start_time,
+                            )
 
                     # CRITICAL: Update session access time every 10 frames to prevent expiration during long propagations
                     if frame_count % 10 == 0:
-                        session.update_access_time()
+                        session.last_accessed = now
 
-                    # Log progress every 50 frames
+                    # Log progress every 50 frames (the only place the clock is read per frame)
                     if frame_count % 50 == 0:
-                        elapsed = time.time() - start_time
-                        fps = frame_count / elapsed if elapsed > 0 else 0
-                        logger.info(
-                            f"Propagation progress: {frame_count}/{session.total_frames} frames "
-                            f"({fps:.1f} fps)"
-                        )
-
-            # Force synchronization after propagation completes
-            if torch.cuda.is_available():
-                torch.cuda.synchronize()
+                        now = time.time()
+                        if info_enabled:
+                            elapsed = now - start_time
+                            fps = frame_count / elapsed if elapsed > 0 else 0
+                            logger.info(
+                                "Propagation progress: %d/%d frames (%.1f fps)",
+                                frame_count,
+                                session.total_frames,
+                                fps,
+                            )
 
             elapsed = time.time() - start_time
             logger.info(
@@ -772,21 +1420,70 @@ class SAM2VideoPredictor:
                 f"{frame_count} frames in {elapsed:.2f}s "
                 f"({frame_count/elapsed:.1f} fps)"
             )
-
-            results["frames"] = video_segments
         else:
             # Simulation mode - propagate with simple motion estimation
-            results["frames"] = self._simulate_propagation(session)
+            yield from self._simulate_propagation(session).items()
 
-        return results
+    def _prefetch_image_features(
+        self,
+        session: VideoSession,
+        frame_idx: int,
+        last_frame: int,
+        batch_size: Optional[int] = None,
+    ):
+        """
+        Drop frame_idx's cached features and make sure the next frames are encoded.
+
+        SAM 2 encodes frames one at a time inside propagate_in_video, which is
+        launch-bound on GPU. When the frame after frame_idx is not cached yet,
+        the next batch_size frames (up to last_frame) are encoded in one forward
+        pass and written to inference_state["cached_features"] in the
+        (image, backbone_out) format SAM 2 reads. Frames are evicted as soon as
+        propagation has passed them, so at most about one batch of features is
+        held on the GPU at a time.
+
+        Runs under the caller's inference_mode/autocast context, so the cached
+        features have the dtype propagate_in_video would produce itself.
+        """
+        if batch_size is None:
+            batch_size = SAM2RuntimeConfig.CURRENT.encoder_batch_size
+
+        inference_state = session.inference_state
+        # SAM 2 replaces this dict on a cache miss, so look it up every time
+        cached_features = inference_state["cached_features"]
+        cached_features.pop(frame_idx, None)
+
+        next_idx = frame_idx + 1
+        end_idx = min(last_frame, inference_state["num_frames"] - 1)
+        if next_idx > end_idx or next_idx in cached_features:
+            return
+
+        images = inference_state["images"]
+        batch_idxs = list(range(next_idx, min(next_idx + batch_size, end_idx + 1)))
+        image_batch = torch.stack(
+            [images[idx] for idx in batch_idxs]
+        ).to(self.device).float()
+        if self._channels_last:
+            image_batch = image_batch.contiguous(memory_format=torch.channels_last)
+
+        backbone_out = self.predictor.forward_image(image_batch)
+
+        # Split the batched backbone output back into per-frame entries
+        for b, idx in enumerate(batch_idxs):
+            frame_out = {
+                "vision_features": backbone_out["vision_features"][b : b + 1],
+                "vision_pos_enc": [x[b : b + 1] for x in backbone_out["vision_pos_enc"]],
+                "backbone_fpn": [x[b : b + 1] for x in backbone_out["backbone_fpn"]],
+            }
+            cached_features[idx] = (image_batch[b : b + 1], frame_out)
 
     def refine_mask(
         self,
         session_id: str,
         frame_idx: int,
         object_id: int,
-        points: List[Tuple[float, float]],
-        labels: List[int],
+        points: Union[np.ndarray, Sequence[Tuple[float, float]]],
+        labels: Union[np.ndarray, Sequence[int]],
     ) -> Dict[str, Any]:
         """
         Add refinement points to an existing object on a specific frame.
@@ -798,8 +1495,8 @@ class SAM2VideoPredictor:
             session_id: Session ID
             frame_idx: Frame index to refine
             object_id: Object ID to refine
-            points: List of (x, y) refinement points
-            labels: List of labels (1 for positive, 0 for negative)
+            points: (N, 2) float32 array (or list) of (x, y) refinement points
+            labels: (N,) array (or list) of labels (1 for positive, 0 for negative)
 
         Returns:
             Dictionary with updated mask
@@ -813,56 +1510,133 @@ class SAM2VideoPredictor:
 
         tracked_object = session.objects[object_id]
 
+        # Convert to numpy (no-copy for float32/int32 arrays)
+        points_np = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        labels_np = np.asarray(labels, dtype=np.int32).reshape(-1)
+
         # Record the refinement
         tracked_object.prompts.append(
             {
                 "frame_idx": frame_idx,
-                "points": points,
-                "labels": labels,
+                "points": points_np,
+                "labels": labels_np,
                 "type": "refinement",
             }
         )
 
-        # Convert to numpy
-        points_np = np.array(points, dtype=np.float32)
-        labels_np = np.array(labels, dtype=np.int32)
-
         # Add refinement to SAM 2
         if self.predictor is not None and session.inference_state is not None:
+            points_in, labels_in = self._prompts_to_device(session, points_np, labels_np)
             # OPTIMIZATION: Use inference_mode for refinement
-            with torch.inference_mode():
+            with torch.inference_mode(), self._autocast():
                 _, out_obj_ids, out_mask_logits = self.predictor.add_new_points_or_box(
                     inference_state=session.inference_state,
                     frame_idx=frame_idx,
                     obj_id=object_id,
-                    points=points_np,
-                    labels=labels_np,
+                    points=points_in,
+                    labels=labels_in,
                 )
 
-                # Force synchronization
-                if torch.cuda.is_available():
+                # OPTIMIZATION: No device-wide sync here; the host copy below waits for
+                # this tensor only. Explicit syncs are kept for debugging.
+                if SAM2RuntimeConfig.CURRENT.debug_sync and torch.cuda.is_available():
                     torch.cuda.synchronize()
 
-                # Convert with validation
-                mask_tensor = (out_mask_logits[0] > 0.0).cpu()
-                mask = mask_tensor.numpy().squeeze().astype(np.uint8)
+                logits = out_mask_logits[0, 0]
 
-                if np.isnan(mask).any():
+                # Validate the float logits (a thresholded uint8 mask can never hold NaN)
+                if not torch.isfinite(logits).all():
                     logger.error(f"Corrupted refined mask for object {object_id}, frame {frame_idx}!")
                     mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
-
-            tracked_object.masks[frame_idx] = mask
+                else:
+                    # OPTIMIZATION: Threshold and copy straight into the object's preallocated
+                    # host buffer (one D2H copy, no per-click allocation or dtype recast).
+                    # The buffer is reused by the next refinement, so the caller gets a
+                    # copy (coalesced clicks share this result across awaiting requests).
+                    gt_buf = tracked_object.mask_gpu_buf
+                    if gt_buf is None or gt_buf.shape != logits.shape or gt_buf.device != logits.device:
+                        gt_buf = torch.empty(logits.shape, dtype=torch.bool, device=logits.device)
+                        tracked_object.mask_gpu_buf = gt_buf
+                    torch.from_numpy(tracked_object.mask_buf).copy_(torch.gt(logits, 0.0, out=gt_buf))
+                    mask = tracked_object.mask_buf.copy()
+
+            tracked_object.set_mask(frame_idx, mask)
         else:
             # Update simulation
-            existing_mask = tracked_object.masks.get(
-                frame_idx,
-                np.zeros((session.frame_height, session.frame_width), dtype=np.uint8),
-            )
-            mask = self._apply_refinement_simulation(existing_mask, points, labels)
-            tracked_object.masks[frame_idx] = mask
+            existing_mask = tracked_object.get_mask(frame_idx)
+            if existing_mask is None:
+                existing_mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
+            mask = self._apply_refinement_simulation(existing_mask, points_np, labels_np)
+            tracked_object.set_mask(frame_idx, mask)
 
         return {"object_id": object_id, "frame_idx": frame_idx, "mask": mask}
 
+    async def refine_mask_coalesced(
+        self,
+        session_id: str,
+        frame_idx: int,
+        object_id: int,
+        points: Union[np.ndarray, Sequence[Tuple[float, float]]],
+        labels: Union[np.ndarray, Sequence[int]],
+        slot: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Coalescing refine_mask for interactive clicks.
+
+        OPTIMIZATION: A click with no decode in flight for its (session, frame,
+        object) is decoded right away. Clicks arriving while that decode runs are
+        concatenated and decoded together with a single add_new_points_or_box call
+        as soon as it finishes; every caller in a batch receives the same result.
+        Decodes run on an executor thread, each inside slot() when given (e.g. a
+        GPU concurrency limit), so the event loop never blocks on the GPU.
+        """
+        loop = asyncio.get_running_loop()
+        key = (session_id, frame_idx, object_id)
+
+        pending = self._pending_refines.get(key)
+        if pending is None:
+            pending = {"points": [], "labels": [], "future": loop.create_future()}
+            self._pending_refines[key] = pending
+            if key not in self._refine_tasks:
+                self._refine_tasks[key] = loop.create_task(self._drain_refines(key, slot))
+
+        pending["points"].append(np.asarray(points, dtype=np.float32).reshape(-1, 2))
+        pending["labels"].append(np.asarray(labels, dtype=np.int32).reshape(-1))
+
+        # Shield so one cancelled caller doesn't cancel the result for the others
+        return await asyncio.shield(pending["future"])
+
+    async def _drain_refines(
+        self, key: Tuple[str, int, int], slot: Optional[Callable[[], AsyncContextManager]]
+    ):
+        """Decode batches of clicks collected under key until none are left"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                pending = self._pending_refines.pop(key, None)
+                if pending is None:
+                    return
+                future = pending["future"]
+                try:
+                    async with slot() if slot is not None else contextlib.nullcontext():
+                        result = await loop.run_in_executor(
+                            None,
+                            self.refine_mask,
+                            *key,
+                            np.concatenate(pending["points"]),
+                            np.concatenate(pending["labels"]),
+                        )
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                        # Mark it retrieved: every waiter may have been cancelled
+                        future.exception()
+                    continue
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._refine_tasks.pop(key, None)
+
     def update_mask(
         self,
         session_id: str,
@@ -894,40 +1668,17 @@ class SAM2VideoPredictor:
 
         tracked_object = session.objects[object_id]
 
-        # Convert to grayscale if RGB/RGBA (from canvas PNG)
-        if mask.ndim == 3:
-            logger.info(f"Mask has {mask.ndim} dimensions (RGB/RGBA), converting to grayscale")
-            # Take first channel (they should all be the same for a binary mask)
-            mask = mask[:, :, 0]
-        elif mask.ndim != 2:
-            raise ValueError(f"Mask must be 2D or 3D array, got {mask.ndim}D")
-
-        # Validate and normalize mask
-        if mask.dtype != np.uint8:
-            mask = (mask * 255).astype(np.uint8)
-
-        # Ensure mask has correct dimensions
-        if mask.shape != (session.frame_height, session.frame_width):
-            logger.warning(
-                f"Mask dimensions {mask.shape} don't match session dimensions "
-                f"({session.frame_height}, {session.frame_width}). Resizing..."
-            )
-            from PIL import Image
-            mask_img = Image.fromarray(mask, mode='L')
-            mask_img = mask_img.resize((session.frame_width, session.frame_height), Image.LANCZOS)
-            mask = np.array(mask_img)
-
-        # Normalize to binary (0 or 255)
-        mask = ((mask > 128) * 255).astype(np.uint8)
+        mask = self._normalize_edited_mask(session, mask)
+        mask_bool = mask.view(np.bool_)
 
         # Update the stored mask
-        tracked_object.masks[frame_idx] = mask
+        tracked_object.set_mask(frame_idx, mask)
 
         # CRITICAL: Update the SAM2 inference state so propagation uses the edited mask
         if self.predictor is not None and session.inference_state is not None:
             try:
-                # Convert mask to boolean for SAM2
-                mask_bool = mask > 128
+                # Hand SAM2 the boolean mask (uploaded to the device when running on CUDA)
+                mask_input = self._mask_to_device(session, mask_bool)
 
                 logger.info(
                     f"Injecting edited mask into SAM2 inference state for object {object_id} on frame {frame_idx}"
@@ -935,12 +1686,12 @@ class SAM2VideoPredictor:
 
                 # Use SAM2's add_new_mask API to inject the edited mask into inference state
                 # This ensures propagation will use the edited mask, not the original
-                with torch.inference_mode():
+                with torch.inference_mode(), self._autocast():
                     self.predictor.add_new_mask(
                         inference_state=session.inference_state,
                         frame_idx=frame_idx,
                         obj_id=object_id,
-                        mask=mask_bool,
+                        mask=mask_input,
                     )
 
                 logger.info(
@@ -952,8 +1703,168 @@ class SAM2VideoPredictor:
                 logger.error("The mask is updated in memory but propagation may use the original mask!")
                 raise ValueError(f"Failed to inject mask into SAM2 inference state: {str(e)}")
 
+        # Response mask is 0/255 (SAM 2 and storage already consumed the 0/1 bytes)
+        np.multiply(mask, 255, out=mask)
+
         return {"object_id": object_id, "frame_idx": frame_idx, "mask": mask}
 
+    def update_masks_bulk(
+        self,
+        session_id: str,
+        frame_idx: int,
+        masks: Dict[int, np.ndarray],
+    ) -> Dict[str, Any]:
+        """
+        Update several objects' masks on one frame with custom edited masks.
+
+        Same as calling update_mask per object, but all SAM2 injections run
+        inside a single inference/autocast context.
+
+        Args:
+            session_id: Session ID
+            frame_idx: Frame index to update
+            masks: Object ID -> custom mask array (H, W) with values 0 or 255
+
+        Returns:
+            Dictionary with the updated mask for each object
+        """
+        session = self.get_session(session_id)
+        if not session:
+            raise ValueError(f"Session not found: {session_id}")
+
+        for object_id in masks:
+            if object_id not in session.objects:
+                raise ValueError(f"Object not found: {object_id}")
+
+        normalized = {}
+        for object_id, mask in masks.items():
+            mask = self._normalize_edited_mask(session, mask)
+            session.objects[object_id].set_mask(frame_idx, mask)
+            normalized[object_id] = mask
+
+        if self.predictor is not None and session.inference_state is not None:
+            logger.info(
+                f"Injecting {len(normalized)} edited masks into SAM2 inference state on frame {frame_idx}"
+            )
+            try:
+                # OPTIMIZATION: One inference/autocast context for every object on the frame
+                with torch.inference_mode(), self._autocast():
+                    for object_id, mask in normalized.items():
+                        self.predictor.add_new_mask(
+                            inference_state=session.inference_state,
+                            frame_idx=frame_idx,
+                            obj_id=object_id,
+                            mask=self._mask_to_device(session, mask.view(np.bool_)),
+                        )
+            except Exception as e:
+                logger.error(f"Failed to update SAM2 inference state: {e}")
+                logger.error("The masks are updated in memory but propagation may use the original masks!")
+                raise ValueError(f"Failed to inject masks into SAM2 inference state: {str(e)}")
+
+        for mask in normalized.values():
+            np.multiply(mask, 255, out=mask)
+
+        return {"frame_idx": frame_idx, "masks": normalized}
+
+    def _normalize_edited_mask(self, session: VideoSession, mask: np.ndarray) -> np.ndarray:
+        """Convert an uploaded edited mask to a (H, W) uint8 0/1 mask at session resolution"""
+        # Convert to grayscale if RGB/RGBA (from canvas PNG)
+        if mask.ndim == 3:
+            logger.info(f"Mask has {mask.ndim} dimensions (RGB/RGBA), converting to grayscale")
+            # OPTIMIZATION: cv2.extractChannel returns a contiguous single-channel buffer, so
+            # the resize/threshold below don't each pay for a strided-view copy
+            if mask.shape[2] == 4:
+                # Canvas PNGs often carry the mask in alpha over a transparent background
+                alpha = cv2.extractChannel(mask, 3)
+                if alpha.min() < 255:
+                    mask = alpha
+                else:
+                    mask = cv2.extractChannel(mask, 0)
+            else:
+                # Take first channel (they should all be the same for a binary mask)
+                mask = cv2.extractChannel(mask, 0)
+        elif mask.ndim != 2:
+            raise ValueError(f"Mask must be 2D or 3D array, got {mask.ndim}D")
+
+        # Validate and normalize mask
+        if mask.dtype != np.uint8:
+            mask = np.multiply(mask, 255, out=np.empty(mask.shape, dtype=np.uint8), casting="unsafe")
+
+        # Ensure mask has correct dimensions
+        if mask.shape != (session.frame_height, session.frame_width):
+            logger.warning(
+                f"Mask dimensions {mask.shape} don't match session dimensions "
+                f"({session.frame_height}, {session.frame_width}). Resizing..."
+            )
+            # OPTIMIZATION: Nearest-neighbour is the right filter for a binary mask and
+            # OpenCV's resize is SIMD/multi-threaded (PIL LANCZOS only adds gray to threshold)
+            mask = cv2.resize(
+                mask, (session.frame_width, session.frame_height), interpolation=cv2.INTER_NEAREST
+            )
+
+        # Normalize to binary
+        # OPTIMIZATION: Threshold once (single SIMD pass) to 0/1. The same bytes serve as
+        # the boolean mask for SAM 2 (zero-copy view) and for storage, and are scaled to
+        # 0/255 in place for the response at the end.
+        _, mask = cv2.threshold(mask, 128, 1, cv2.THRESH_BINARY)
+        return mask
+
+    def _prompts_to_device(
+        self, session: VideoSession, points_np: np.ndarray, labels_np: np.ndarray
+    ) -> Tuple[Any, Any]:
+        """
+        Stage click prompts in per-session pinned buffers and upload them asynchronously.
+
+        Returns device tensors on CUDA (SAM 2 accepts tensors as-is), otherwise the
+        NumPy arrays unchanged.
+        """
+        n = len(points_np)
+        if self.device.type != "cuda" or n == 0 or n > self.MAX_PROMPT_POINTS:
+            return points_np, labels_np
+
+        if session.points_upload_buf is None:
+            session.points_upload_buf = torch.empty(
+                (self.MAX_PROMPT_POINTS, 2), dtype=torch.float32, pin_memory=True
+            )
+            session.labels_upload_buf = torch.empty(
+                (self.MAX_PROMPT_POINTS,), dtype=torch.int32, pin_memory=True
+            )
+        elif session.prompt_upload_event is not None:
+            # Don't overwrite the staging buffers while a previous copy may still read them
+            session.prompt_upload_event.synchronize()
+
+        session.points_upload_buf[:n].copy_(torch.from_numpy(points_np))
+        session.labels_upload_buf[:n].copy_(torch.from_numpy(labels_np))
+        points_gpu = session.points_upload_buf[:n].to(self.device, non_blocking=True)
+        labels_gpu = session.labels_upload_buf[:n].to(self.device, non_blocking=True)
+        session.prompt_upload_event = torch.cuda.Event()
+        session.prompt_upload_event.record()
+        return points_gpu, labels_gpu
+
+    def _mask_to_device(self, session: VideoSession, mask: np.ndarray):
+        """
+        Move a boolean mask to the predictor's device.
+
+        OPTIMIZATION: On CUDA the mask goes through a per-session pinned buffer and an
+        async copy. SAM 2 then uses the device tensor without another host-to-device
+        copy. Other devices get the NumPy array back unchanged.
+        """
+        if self.device.type != "cuda":
+            return mask
+
+        if session.mask_upload_buf is None or tuple(session.mask_upload_buf.shape) != mask.shape:
+            session.mask_upload_buf = torch.empty(mask.shape, dtype=torch.bool, pin_memory=True)
+            session.mask_upload_event = None
+        elif session.mask_upload_event is not None:
+            # Don't overwrite the staging buffer while a previous copy may still read it
+            session.mask_upload_event.synchronize()
+
+        session.mask_upload_buf.copy_(torch.from_numpy(mask))
+        mask_gpu = session.mask_upload_buf.to(self.device, non_blocking=True)
+        session.mask_upload_event = torch.cuda.Event()
+        session.mask_upload_event.record()
+        return mask_gpu
+
     def get_frame_masks(self, session_id: str, frame_idx: int) -> Dict[int, np.ndarray]:
         """Get all object masks for a specific frame"""
         session = self.get_session(session_id)
@@ -962,8 +1873,25 @@ class SAM2VideoPredictor:
 
         frame_masks = {}
         for obj_id, obj in session.objects.items():
-            if frame_idx in obj.masks:
-                frame_masks[obj_id] = obj.masks[frame_idx]
+            mask = obj.get_mask(frame_idx)
+            if mask is not None:
+                frame_masks[obj_id] = mask
+
+        return frame_masks
+
+    def get_frame_masks_packed(
+        self, session_id: str, frame_idx: int
+    ) -> Dict[int, np.ndarray]:
+        """Get all object masks for a frame as packed bit rows (see MaskStore)"""
+        session = self.get_session(session_id)
+        if not session:
+            raise ValueError(f"Session not found: {session_id}")
+
+        frame_masks = {}
+        for obj_id, obj in session.objects.items():
+            packed = obj.masks.get_packed(frame_idx) if obj.masks is not None else None
+            if packed is not None:
+                frame_masks[obj_id] = packed
 
         return frame_masks
 
@@ -975,7 +1903,10 @@ class SAM2VideoPredictor:
 
         all_masks = {}
         for obj_id, obj in session.objects.items():
-            all_masks[obj_id] = obj.masks.copy()
+            # OPTIMIZATION: Unpack every stored frame in one call; per-frame entries are
+            # views into a single contiguous (n_frames, H, W) stack
+            frame_idxs, stack = obj.get_mask_stack()
+            all_masks[obj_id] = dict(zip(frame_idxs.tolist(), stack))
 
         return all_masks
 
@@ -984,8 +1915,8 @@ class SAM2VideoPredictor:
     def _simulate_mask(
         self,
         session: VideoSession,
-        points: List[Tuple[float, float]],
-        labels: List[int],
+        points: Union[np.ndarray, Sequence[Tuple[float, float]]],
+        labels: Union[np.ndarray, Sequence[int]],
     ) -> np.ndarray:
         """Simulate mask generation for testing"""
         mask = np.zeros((session.frame_height, session.frame_width), dtype=np.uint8)
@@ -1014,50 +1945,60 @@ class SAM2VideoPredictor:
         self, session: VideoSession
     ) -> Dict[int, Dict[int, np.ndarray]]:
         """Simulate mask propagation for testing"""
-        results = {}
-
-        for frame_idx in range(session.total_frames):
-            frame_masks = {}
-            for obj_id, obj in session.objects.items():
-                # Find nearest annotated frame
-                annotated_frames = list(obj.masks.keys())
-                if not annotated_frames:
-                    continue
-
-                nearest_frame = min(annotated_frames, key=lambda f: abs(f - frame_idx))
-                base_mask = obj.masks[nearest_frame]
+        results: Dict[int, Dict[int, np.ndarray]] = {
+            frame_idx: {} for frame_idx in range(session.total_frames)
+        }
+        all_frames = np.arange(session.total_frames)
 
-                # Add slight random shift for simulation
-                shift = (frame_idx - nearest_frame) * 2  # 2 pixels per frame
+        for obj_id, obj in session.objects.items():
+            annotated = obj.mask_frames
+            if annotated.size == 0:
+                continue
+
+            # OPTIMIZATION: Nearest annotated frame for every frame via binary search over the
+            # (already sorted) annotated frames: O(N log K) with no (K, N) distance matrix
+            pos = np.searchsorted(annotated, all_frames)
+            left = annotated[np.maximum(pos - 1, 0)]
+            right = annotated[np.minimum(pos, len(annotated) - 1)]
+            # Ties go to the earlier frame
+            nearest = np.where(np.abs(all_frames - left) <= np.abs(right - all_frames), left, right)
+            shifts = (all_frames - nearest) * 2  # 2 pixels per frame
+
+            # One warpAffine per unique (base frame, shift); frames sharing it share the mask
+            pairs = np.stack([nearest, shifts], axis=1)
+            unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            for group, (base_frame, shift) in enumerate(unique_pairs):
+                base_mask = obj.get_mask(int(base_frame))
                 if shift != 0:
                     M = np.float32([[1, 0, shift], [0, 1, 0]])
                     propagated_mask = cv2.warpAffine(
                         base_mask, M, (session.frame_width, session.frame_height)
                     )
                 else:
-                    propagated_mask = base_mask.copy()
-
-                frame_masks[obj_id] = propagated_mask
-                obj.masks[frame_idx] = propagated_mask
+                    propagated_mask = base_mask
 
-            results[frame_idx] = frame_masks
+                group_frames = all_frames[inverse == group]
+                obj.set_masks(group_frames, propagated_mask)
+                for frame_idx in group_frames.tolist():
+                    results[frame_idx][obj_id] = propagated_mask
 
         return results
 
     def _apply_refinement_simulation(
-        self, mask: np.ndarray, points: List[Tuple[float, float]], labels: List[int]
+        self,
+        mask: np.ndarray,
+        points: Union[np.ndarray, Sequence[Tuple[float, float]]],
+        labels: Union[np.ndarray, Sequence[int]],
     ) -> np.ndarray:
         """Apply refinement points to an existing mask in simulation mode"""
         refined_mask = mask.copy()
         h, w = mask.shape
+        radius = min(h, w) // 15
 
         for point, label in zip(points, labels):
-            x, y = int(point[0]), int(point[1])
-            radius = min(h, w) // 15
-
-            if label == 1:  # Add to mask
-                cv2.circle(refined_mask, (x, y), radius, 1, -1)
-            else:  # Remove from mask
-                cv2.circle(refined_mask, (x, y), radius, 0, -1)
+            center = (int(point[0]), int(point[1]))
+            # 1 adds to the mask, anything else removes from it
+            cv2.circle(refined_mask, center, radius, 1 if label == 1 else 0, -1)
 
         return refined_mask
@@ -11,20 +11,39 @@ It supports:
 """
 
 import asyncio
+import base64
+import concurrent.futures
 import logging
 import os
+import threading
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
-
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+import msgpack
+import numpy as np
+import orjson
+import torch
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.requests import HTTPConnection
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 
 from core.job_manager import InMemoryJobManager, JobManager
-from core.sam2_video_predictor import SAM2VideoPredictor
+from core.sam2_video_predictor import (
+    SAM2RuntimeConfig,
+    SAM2VideoPredictor,
+    mask_to_rle_bytes,
+)
 from schemas import (
     AddObjectRequest,
     AddObjectResponse,
@@ -46,8 +65,12 @@ from schemas import (
     SessionStatusResponse,
     UpdateMaskRequest,
     UpdateMaskResponse,
+    UpdateMasksBulkRequest,
+    UpdateMasksBulkResponse,
     decode_mask,
     encode_mask,
+    encode_mask_fast,
+    encode_mask_rle,
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -61,6 +84,158 @@ cleanup_task: Optional[asyncio.Task] = None
 job_manager: Optional[JobManager] = None
 
 
+def get_encode_pool(connection: HTTPConnection) -> concurrent.futures.ThreadPoolExecutor:
+    """Dependency returning the lifespan-owned mask encoding pool"""
+    return connection.app.state.encode_pool
+
+
+async def encode_mask_async(
+    pool: concurrent.futures.ThreadPoolExecutor, mask: np.ndarray, encoder: Callable = encode_mask_fast
+):
+    """Encode one mask on the encode pool"""
+    return await asyncio.get_running_loop().run_in_executor(pool, encoder, mask)
+
+
+async def encode_masks_parallel(
+    pool: concurrent.futures.ThreadPoolExecutor,
+    masks: Dict[int, np.ndarray],
+    encoder: Callable = encode_mask_fast,
+) -> Dict[int, object]:
+    """Encode a dict of object masks on the encode pool, preserving keys"""
+    if not masks:
+        return {}
+    loop = asyncio.get_running_loop()
+    items = list(masks.items())
+    encoded = await asyncio.gather(
+        *[loop.run_in_executor(pool, encoder, mask) for _, mask in items]
+    )
+    return {obj_id: value for (obj_id, _), value in zip(items, encoded)}
+
+
+class GpuLimiter:
+    """
+    Bounded concurrent GPU work with a soft queue depth.
+
+    Callers beyond max_queued waiters are turned away with 429 instead of piling
+    up. All state is touched on the event loop only.
+    """
+
+    def __init__(self, max_inflight: int, max_queued: int):
+        self._sem = asyncio.Semaphore(max_inflight)
+        self.max_queued = max_queued
+        self._waiters = 0
+
+    def reject_if_saturated(self):
+        """Raise 429 when every slot is busy and the soft queue depth is exceeded"""
+        if self._sem.locked() and self._waiters >= self.max_queued:
+            raise HTTPException(
+                status_code=429,
+                detail="GPU busy, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+    async def _acquire(self):
+        self._waiters += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self._waiters -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one slot for the duration of the block"""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+    def wrap_blocking(self, func: Callable, loop: asyncio.AbstractEventLoop) -> Callable:
+        """Wrap a blocking job function so its worker thread holds a slot while running"""
+
+        def run(**params):
+            asyncio.run_coroutine_threadsafe(self._acquire(), loop).result()
+            try:
+                return func(**params)
+            finally:
+                loop.call_soon_threadsafe(self._sem.release)
+
+        return run
+
+
+# OPTIMIZATION: Bound concurrent GPU work. Interactive calls and propagations otherwise all
+# contend for one CUDA context and latency blows up under load. Propagations (jobs, streams,
+# WebSocket) hold the GPU for minutes, so they get their own limit and can't starve the
+# interactive endpoints; at most SAM_MAX_INFLIGHT + SAM_MAX_PROPAGATIONS run at once.
+GPU = GpuLimiter(
+    max_inflight=int(os.getenv("SAM_MAX_INFLIGHT", "1")),
+    max_queued=int(os.getenv("SAM_MAX_QUEUED", "8")),
+)
+PROPAGATION_GPU = GpuLimiter(
+    max_inflight=int(os.getenv("SAM_MAX_PROPAGATIONS", "1")),
+    max_queued=int(os.getenv("SAM_MAX_QUEUED_PROPAGATIONS", "2")),
+)
+
+
+_STREAM_DONE = object()
+
+# Object ids are int dict keys; the trailing newline makes each dump one NDJSON line
+_NDJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+
+
+async def iterate_in_thread(make_iter: Callable[[], Iterator], maxsize: int = 8) -> AsyncIterator:
+    """
+    Drive a blocking iterator on one dedicated thread and yield its items asynchronously.
+
+    The iterator is created and consumed on the same thread, which the SAM 2
+    propagation generator needs (inference mode is thread-local). Items are
+    handed to an asyncio.Queue on the loop, so the consumer waits without
+    occupying an executor thread; a semaphore of maxsize slots applies
+    backpressure, and the producer stops once the consumer goes away.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(maxsize)
+    stop = threading.Event()
+
+    def put(item, bounded: bool = True) -> bool:
+        if bounded:
+            while not slots.acquire(timeout=0.5):
+                if stop.is_set():
+                    return False
+        if stop.is_set():
+            return False
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed
+            return False
+        return True
+
+    def produce():
+        try:
+            for item in make_iter():
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e, bounded=False)
+        finally:
+            put(_STREAM_DONE, bounded=False)
+
+    threading.Thread(target=produce, name="propagate-stream", daemon=True).start()
+    try:
+        while True:
+            item = await items.get()
+            if item is _STREAM_DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+
+
 async def auto_cleanup_sessions():
     """Background task that automatically cleans up expired sessions"""
     logger.info("Starting auto-cleanup background task (runs every 60 seconds)")
@@ -90,6 +265,20 @@ async def lifespan(app: FastAPI):
     job_manager = InMemoryJobManager(max_workers=max_workers)
     logger.info(f"Job manager initialized with {max_workers} workers")
 
+    # OPTIMIZATION: Mask encoding (PNG/RLE) runs on a dedicated thread pool so multi-object
+    # responses encode in parallel (cv2 and zlib release the GIL) and the event loop stays
+    # free for health checks and other requests while a large response is being built.
+    encode_workers = int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 4)))
+    app.state.encode_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=encode_workers, thread_name_prefix="mask-encode"
+    )
+    logger.info(f"Mask encode pool initialized with {encode_workers} workers")
+
+    # Surface accidental host-device syncs while debugging GPU latency
+    if SAM2RuntimeConfig.CURRENT.debug_sync and torch.cuda.is_available():
+        torch.cuda.set_sync_debug_mode("warn")
+        logger.info("CUDA sync debug mode enabled (warn)")
+
     # Determine model directory (use env var or default)
     model_dir = os.getenv("MODEL_DIR", str(Path(__file__).parent / "models"))
 
@@ -134,6 +323,8 @@ async def lifespan(app: FastAPI):
         job_manager.shutdown()
         logger.info("Job manager shut down")
 
+    app.state.encode_pool.shutdown(wait=False)
+
     if sam2_predictor:
         for session_id in list(sam2_predictor.sessions.keys()):
             sam2_predictor.close_session(session_id)
@@ -145,6 +336,9 @@ app = FastAPI(
     description="Video-based segmentation with temporal propagation using Meta's SAM 2",
     version="2.0.0",
     lifespan=lifespan,
+    # OPTIMIZATION: orjson serializes the large base64/RLE mask payloads several times
+    # faster than the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -255,7 +449,7 @@ async def get_session_status(session_id: str):
                 "name": obj.name,
                 "category": obj.category,
                 "color": list(obj.color),
-                "frames_with_masks": len(obj.masks),
+                "frames_with_masks": len(obj.mask_frames),
             }
         )
 
@@ -296,7 +490,10 @@ async def close_session(request: CloseSessionRequest):
 
 
 @app.post("/add-object", response_model=AddObjectResponse)
-async def add_object(request: AddObjectRequest):
+async def add_object(
+    request: AddObjectRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
     """
     Add a new object to track using point prompts.
 
@@ -307,19 +504,23 @@ async def add_object(request: AddObjectRequest):
     if not sam2_predictor:
         raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
 
-    try:
-        # Convert points to tuples
-        points = [(p[0], p[1]) for p in request.points]
+    GPU.reject_if_saturated()
 
-        result = sam2_predictor.add_object(
-            session_id=request.session_id,
-            frame_idx=request.frame_idx,
-            object_id=request.object_id,
-            points=points,
-            labels=request.labels,
-            name=request.name or "",
-            category=request.category or "",
-        )
+    try:
+        # OPTIMIZATION: One array conversion instead of a per-point tuple loop
+        points = np.asarray(request.points, dtype=np.float32).reshape(-1, 2)
+        labels = np.asarray(request.labels, dtype=np.int32)
+
+        async with GPU.slot():
+            result = sam2_predictor.add_object(
+                session_id=request.session_id,
+                frame_idx=request.frame_idx,
+                object_id=request.object_id,
+                points=points,
+                labels=labels,
+                name=request.name or "",
+                category=request.category or "",
+            )
 
         return AddObjectResponse(
             object_id=result["object_id"],
@@ -327,7 +528,7 @@ async def add_object(request: AddObjectRequest):
             category=result["category"],
             color=list(result["color"]),
             frame_idx=result["frame_idx"],
-            mask=encode_mask(result["mask"]),
+            mask=await encode_mask_async(pool, result["mask"]),
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -337,7 +538,10 @@ async def add_object(request: AddObjectRequest):
 
 
 @app.post("/add-object-box", response_model=AddObjectResponse)
-async def add_object_with_box(request: AddObjectWithBoxRequest):
+async def add_object_with_box(
+    request: AddObjectWithBoxRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
     """
     Add a new object to track using a bounding box.
 
@@ -346,15 +550,18 @@ async def add_object_with_box(request: AddObjectWithBoxRequest):
     if not sam2_predictor:
         raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
 
+    GPU.reject_if_saturated()
+
     try:
-        result = sam2_predictor.add_object_with_box(
-            session_id=request.session_id,
-            frame_idx=request.frame_idx,
-            object_id=request.object_id,
-            box=tuple(request.box),
-            name=request.name or "",
-            category=request.category or "",
-        )
+        async with GPU.slot():
+            result = sam2_predictor.add_object_with_box(
+                session_id=request.session_id,
+                frame_idx=request.frame_idx,
+                object_id=request.object_id,
+                box=tuple(request.box),
+                name=request.name or "",
+                category=request.category or "",
+            )
 
         return AddObjectResponse(
             object_id=result["object_id"],
@@ -362,7 +569,7 @@ async def add_object_with_box(request: AddObjectWithBoxRequest):
             category=result["category"],
             color=list(result["color"]),
             frame_idx=result["frame_idx"],
-            mask=encode_mask(result["mask"]),
+            mask=await encode_mask_async(pool, result["mask"]),
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -392,16 +599,23 @@ async def propagate_masks(request: PropagateRequest):
     if not job_manager:
         raise HTTPException(status_code=503, detail="Job manager not initialized")
 
+    PROPAGATION_GPU.reject_if_saturated()
+
     try:
         # Submit propagation as a background job
         job_id = job_manager.submit_job(
             job_type="propagate_masks",
-            task_func=sam2_predictor.propagate_masks,
+            task_func=PROPAGATION_GPU.wrap_blocking(
+                sam2_predictor.propagate_masks, asyncio.get_running_loop()
+            ),
             params={
                 "session_id": request.session_id,
                 "start_frame": request.start_frame,
                 "end_frame": request.end_frame,
                 "direction": request.direction or "both",
+                # Job results don't carry masks (clients fetch them per frame),
+                # so skip encoding every frame
+                "include_frames": False,
             },
         )
 
@@ -422,6 +636,133 @@ async def propagate_masks(request: PropagateRequest):
         )
 
 
+@app.post("/propagate/stream")
+async def propagate_masks_stream(
+    request: PropagateRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
+    """
+    Propagate masks and stream the results as NDJSON, one line per frame.
+
+    Each line is {"frame_idx": int, "masks": {object_id: base64 PNG}}. A final
+    {"done": true, "frames": n} line marks completion, or {"error": ...} if
+    propagation fails midway. Unlike /propagate, nothing is buffered server-side,
+    so clients can paint masks as soon as each frame is ready.
+    """
+    if not sam2_predictor:
+        raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
+
+    session = sam2_predictor.get_session(request.session_id)
+    if not session:
+        raise HTTPException(status_code=400, detail=f"Session not found: {request.session_id}")
+    if not session.objects:
+        raise HTTPException(status_code=400, detail="No objects to propagate")
+
+    PROPAGATION_GPU.reject_if_saturated()
+
+    frames = iterate_in_thread(
+        lambda: sam2_predictor.iter_propagate_masks(
+            session_id=request.session_id,
+            start_frame=request.start_frame,
+            end_frame=request.end_frame,
+            direction=request.direction or "both",
+        )
+    )
+
+    async def ndjson_lines():
+        frame_count = 0
+        async with PROPAGATION_GPU.slot():
+            try:
+                async for frame_idx, frame_masks in frames:
+                    line = {
+                        "frame_idx": int(frame_idx),
+                        "masks": await encode_masks_parallel(pool, frame_masks),
+                    }
+                    frame_count += 1
+                    yield orjson.dumps(line, option=_NDJSON_OPTIONS)
+            except Exception as e:
+                logger.error(f"Streaming propagation failed for session {request.session_id}: {e}")
+                yield orjson.dumps({"error": str(e)}, option=_NDJSON_OPTIONS)
+                return
+            finally:
+                # Stops the propagation thread if the client disconnects early
+                await frames.aclose()
+        yield orjson.dumps({"done": True, "frames": frame_count}, option=_NDJSON_OPTIONS)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.websocket("/ws/propagate")
+async def propagate_masks_ws(
+    websocket: WebSocket,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
+    """
+    Propagate masks over a WebSocket as binary MessagePack frames.
+
+    The client sends one JSON message with PropagateRequest fields. The server
+    replies with one binary frame per video frame:
+    {"f": frame_idx, "s": [h, w], "m": {object_id: rle}}, where rle holds the
+    column-major run lengths of mask_to_rle as little-endian uint32. A final
+    {"done": true, "frames": n} (or {"error": ...}) frame ends the stream. This
+    avoids the base64 and JSON overhead of the PNG-based endpoints.
+    """
+    await websocket.accept()
+    try:
+        request = PropagateRequest(**await websocket.receive_json())
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        await websocket.send_bytes(msgpack.packb({"error": f"Invalid request: {e}"}))
+        await websocket.close(code=1003)
+        return
+
+    session = sam2_predictor.get_session(request.session_id) if sam2_predictor else None
+    if session is None or not session.objects:
+        detail = "No objects to propagate" if session else f"Session not found: {request.session_id}"
+        await websocket.send_bytes(msgpack.packb({"error": detail}))
+        await websocket.close(code=1008)
+        return
+
+    try:
+        PROPAGATION_GPU.reject_if_saturated()
+    except HTTPException as e:
+        # 1013: try again later
+        await websocket.send_bytes(msgpack.packb({"error": e.detail, "retry_after": 1}))
+        await websocket.close(code=1013)
+        return
+
+    frames = iterate_in_thread(
+        lambda: sam2_predictor.iter_propagate_masks(
+            session_id=request.session_id,
+            start_frame=request.start_frame,
+            end_frame=request.end_frame,
+            direction=request.direction or "both",
+        )
+    )
+    mask_shape = [session.frame_height, session.frame_width]
+    frame_count = 0
+    try:
+        async with PROPAGATION_GPU.slot():
+            async for frame_idx, frame_masks in frames:
+                rles = await encode_masks_parallel(pool, frame_masks, mask_to_rle_bytes)
+                await websocket.send_bytes(
+                    msgpack.packb({"f": int(frame_idx), "s": mask_shape, "m": rles})
+                )
+                frame_count += 1
+        await websocket.send_bytes(msgpack.packb({"done": True, "frames": frame_count}))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Propagation WebSocket closed by client for session {request.session_id}")
+    except Exception as e:
+        logger.error(f"WebSocket propagation failed for session {request.session_id}: {e}")
+        await websocket.send_bytes(msgpack.packb({"error": str(e)}))
+        await websocket.close(code=1011)
+    finally:
+        # Stops the propagation thread if the client goes away early
+        await frames.aclose()
+
+
 # ============================================================
 # Job Management Endpoints
 # ============================================================
@@ -461,7 +802,10 @@ async def get_job_status(job_id: str):
 
 
 @app.post("/refine", response_model=RefineResponse)
-async def refine_mask(request: RefineRequest):
+async def refine_mask(
+    request: RefineRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
     """
     Add refinement points to correct a mask on a specific frame.
 
@@ -470,22 +814,28 @@ async def refine_mask(request: RefineRequest):
     if not sam2_predictor:
         raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
 
+    GPU.reject_if_saturated()
+
     try:
-        # Convert points to tuples
-        points = [(p[0], p[1]) for p in request.points]
+        # OPTIMIZATION: One array conversion instead of a per-point tuple loop
+        points = np.asarray(request.points, dtype=np.float32).reshape(-1, 2)
+        labels = np.asarray(request.labels, dtype=np.int32)
 
-        result = sam2_predictor.refine_mask(
+        # Rapid clicks on the same object/frame are merged into one decoder call,
+        # which holds a GPU slot (one per decode, not per click)
+        result = await sam2_predictor.refine_mask_coalesced(
             session_id=request.session_id,
             frame_idx=request.frame_idx,
             object_id=request.object_id,
             points=points,
-            labels=request.labels,
+            labels=labels,
+            slot=GPU.slot,
         )
 
         return RefineResponse(
             object_id=result["object_id"],
             frame_idx=result["frame_idx"],
-            mask=encode_mask(result["mask"]),
+            mask=await encode_mask_async(pool, result["mask"]),
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -495,7 +845,10 @@ async def refine_mask(request: RefineRequest):
 
 
 @app.post("/update-mask", response_model=UpdateMaskResponse)
-async def update_mask(request: UpdateMaskRequest):
+async def update_mask(
+    request: UpdateMaskRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
     """
     Update a mask with a custom edited mask (e.g., from polygon editing).
 
@@ -505,21 +858,24 @@ async def update_mask(request: UpdateMaskRequest):
     if not sam2_predictor:
         raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
 
+    GPU.reject_if_saturated()
+
     try:
         # Decode the base64 mask
         mask_array = decode_mask(request.mask)
 
-        result = sam2_predictor.update_mask(
-            session_id=request.session_id,
-            frame_idx=request.frame_idx,
-            object_id=request.object_id,
-            mask=mask_array,
-        )
+        async with GPU.slot():
+            result = sam2_predictor.update_mask(
+                session_id=request.session_id,
+                frame_idx=request.frame_idx,
+                object_id=request.object_id,
+                mask=mask_array,
+            )
 
         return UpdateMaskResponse(
             object_id=result["object_id"],
             frame_idx=result["frame_idx"],
-            mask=encode_mask(result["mask"]),
+            mask=await encode_mask_async(pool, result["mask"], encode_mask),
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -528,24 +884,99 @@ async def update_mask(request: UpdateMaskRequest):
         raise HTTPException(status_code=500, detail=f"Failed to update mask: {str(e)}")
 
 
+@app.post("/session/update_masks_bulk", response_model=UpdateMasksBulkResponse)
+async def update_masks_bulk(
+    request: UpdateMasksBulkRequest,
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
+    """
+    Update several objects' masks on one frame in a single call.
+
+    Use this instead of one /update-mask request per object when applying
+    polygon edits for multiple objects.
+    """
+    if not sam2_predictor:
+        raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
+
+    GPU.reject_if_saturated()
+
+    try:
+        masks = {obj_id: decode_mask(mask) for obj_id, mask in request.masks.items()}
+
+        async with GPU.slot():
+            result = sam2_predictor.update_masks_bulk(
+                session_id=request.session_id,
+                frame_idx=request.frame_idx,
+                masks=masks,
+            )
+
+        return UpdateMasksBulkResponse(
+            frame_idx=result["frame_idx"],
+            masks=await encode_masks_parallel(pool, result["masks"]),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to update masks: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to update masks: {str(e)}")
+
+
 # ============================================================
 # Frame Mask Retrieval
 # ============================================================
 
 
 @app.post("/frame-masks", response_model=GetFrameMasksResponse)
-async def get_frame_masks(request: GetFrameMasksRequest):
-    """Get all object masks for a specific frame"""
+async def get_frame_masks(
+    request: GetFrameMasksRequest,
+    encoding: str = "png",
+    pool: concurrent.futures.ThreadPoolExecutor = Depends(get_encode_pool),
+):
+    """
+    Get all object masks for a specific frame.
+
+    Pass ?encoding=packed to receive base64 bit-packed masks (np.packbits, row-major)
+    straight from storage, skipping the unpack and PNG encode, or ?encoding=rle
+    for COCO-style RLE objects that need no PNG decoder on the client.
+    """
     if not sam2_predictor:
         raise HTTPException(status_code=503, detail="SAM 2 service not initialized")
 
+    if encoding not in ("png", "packed", "rle"):
+        raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
+
     try:
+        if encoding == "packed":
+            session = sam2_predictor.get_session(request.session_id)
+            if not session:
+                raise ValueError(f"Session not found: {request.session_id}")
+            packed = sam2_predictor.get_frame_masks_packed(
+                session_id=request.session_id,
+                frame_idx=request.frame_idx,
+            )
+            return GetFrameMasksResponse(
+                frame_idx=request.frame_idx,
+                masks={
+                    obj_id: base64.b64encode(row.tobytes()).decode("utf-8")
+                    for obj_id, row in packed.items()
+                },
+                encoding="packed",
+                mask_shape=[session.frame_height, session.frame_width],
+            )
+
         masks = sam2_predictor.get_frame_masks(
             session_id=request.session_id,
             frame_idx=request.frame_idx,
         )
 
-        masks_encoded = {obj_id: encode_mask(mask) for obj_id, mask in masks.items()}
+        if encoding == "rle":
+            return GetFrameMasksResponse(
+                frame_idx=request.frame_idx,
+                masks=await encode_masks_parallel(pool, masks, encode_mask_rle),
+                encoding="rle",
+            )
+
+        masks_encoded = await encode_masks_parallel(pool, masks)
 
         return GetFrameMasksResponse(
             frame_idx=request.frame_idx,
@@ -581,4 +1012,7 @@ async def trigger_cleanup(background_tasks: BackgroundTasks):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # uvloop + httptools come with uvicorn[standard]; naming them makes a missing install
+    # fail loudly instead of silently falling back to asyncio + h11. Keep a single worker:
+    # sessions and the model live in process memory.
+    uvicorn.run(app, host="0.0.0.0", port=8001, loop="uvloop", http="httptools", workers=1)
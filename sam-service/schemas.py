@@ -5,13 +5,21 @@ Request/response schemas for the SAM 2 video annotation API.
 """
 
 import base64
+import functools
 import io
-from typing import Dict, List, Optional
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import cv2
 import numpy as np
 from PIL import Image
 from pydantic import BaseModel, Field
 
+from core.sam2_video_predictor import mask_to_rle, rle_to_mask
+
+logger = logging.getLogger(__name__)
+
 # ============================================================
 # Session Management
 # ============================================================
@@ -131,12 +139,19 @@ class PropagateRequest(BaseModel):
     )
 
 
+class MaskRLE(BaseModel):
+    """COCO-style uncompressed RLE mask (column-major runs, starting with zeros)"""
+
+    size: List[int] = Field(..., description="[height, width]")
+    counts: List[int] = Field(..., description="Alternating run lengths of 0s and 1s")
+
+
 class FrameMask(BaseModel):
     """Mask data for a single frame"""
 
     frame_idx: int = Field(..., description="Frame index")
-    masks: Dict[int, str] = Field(
-        ..., description="Object ID -> Base64 encoded mask mapping"
+    masks: Dict[int, Union[str, MaskRLE]] = Field(
+        ..., description="Object ID -> Base64 encoded mask (or RLE) mapping"
     )
 
 
@@ -170,6 +185,25 @@ class UpdateMaskResponse(BaseModel):
     mask: str = Field(..., description="Base64 encoded updated mask")
 
 
+class UpdateMasksBulkRequest(BaseModel):
+    """Request to update several objects' masks on one frame"""
+
+    session_id: str = Field(..., description="Session identifier")
+    frame_idx: int = Field(..., description="Frame index")
+    masks: Dict[int, str] = Field(
+        ..., description="Object ID -> Base64 encoded mask (PNG format)"
+    )
+
+
+class UpdateMasksBulkResponse(BaseModel):
+    """Response after updating several masks"""
+
+    frame_idx: int = Field(..., description="Frame index")
+    masks: Dict[int, str] = Field(
+        ..., description="Object ID -> Base64 encoded updated mask"
+    )
+
+
 # ============================================================
 # Refinement
 # ============================================================
@@ -211,8 +245,18 @@ class GetFrameMasksResponse(BaseModel):
     """Response with masks for a specific frame"""
 
     frame_idx: int = Field(..., description="Frame index")
-    masks: Dict[int, str] = Field(
-        ..., description="Object ID -> Base64 encoded mask mapping"
+    masks: Dict[int, Union[str, MaskRLE]] = Field(
+        ..., description="Object ID -> Base64 encoded mask (or RLE) mapping"
+    )
+    encoding: str = Field(
+        default="png",
+        description=(
+            "Mask encoding: 'png', 'packed' (base64 of np.packbits, row-major) "
+            "or 'rle' (MaskRLE objects)"
+        ),
+    )
+    mask_shape: Optional[List[int]] = Field(
+        default=None, description="[height, width] needed to unpack 'packed' masks"
     )
 
 
@@ -243,41 +287,110 @@ class ErrorResponse(BaseModel):
 # ============================================================
 
 
-def encode_mask(mask_array: np.ndarray) -> str:
-    """Encode numpy mask array to base64 PNG string with validation"""
-    import logging
-    logger = logging.getLogger(__name__)
+# OPTIMIZATION: Binary masks are low entropy, so fast deflate (level 1) produces nearly the
+# same size as PIL's optimize pass at a fraction of the CPU, and cv2.imencode releases the GIL
+_PNG_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+# Per-thread scratch buffer for encode_mask (encodes run concurrently on the encode pool)
+_TLS = threading.local()
+
+
+def _scratch_buffer(shape) -> np.ndarray:
+    """Return this thread's reusable uint8 mask buffer, reallocated only on shape change"""
+    buf = getattr(_TLS, "buf", None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.uint8)
+        _TLS.buf = buf
+    return buf
+
+
+def _prepare_bool(mask_array: np.ndarray) -> np.ndarray:
+    """bool -> 0/255 uint8 in the per-thread scratch buffer"""
+    buf = _scratch_buffer(mask_array.shape)
+    np.multiply(mask_array.view(np.uint8), 255, out=buf)
+    return buf
 
+
+def _prepare_uint8(mask_array: np.ndarray) -> np.ndarray:
+    """uint8 is always in range; encoded as-is"""
+    return mask_array
+
+
+def _prepare_scaled(mask_array: np.ndarray) -> np.ndarray:
+    """Floats (0..1) and other numeric dtypes: NaN check, then one fused scale/clip/cast"""
     # CRITICAL: Validate mask before encoding to prevent corrupted output
-    if np.isnan(mask_array).any():
+    if np.issubdtype(mask_array.dtype, np.floating) and np.isnan(mask_array).any():
         logger.error("encode_mask: Mask contains NaN values! Returning empty mask.")
-        mask_array = np.zeros_like(mask_array, dtype=np.uint8)
+        return np.zeros(mask_array.shape, dtype=np.uint8)
+
+    scaled = np.multiply(mask_array, 255, dtype=np.float32)
+    np.clip(scaled, 0, 255, out=scaled)
+    buf = _scratch_buffer(mask_array.shape)
+    np.copyto(buf, scaled, casting="unsafe")
+    return buf
+
+
+# OPTIMIZATION: Dispatch once on dtype so each mask does exactly the work it needs. uint8 and
+# bool (the SAM outputs) skip validation entirely; anything else falls back to _prepare_scaled.
+# Conversions write into a per-thread buffer allocated once per frame size.
+_MASK_PREPARERS = {
+    np.dtype(np.bool_): _prepare_bool,
+    np.dtype(np.uint8): _prepare_uint8,
+    np.dtype(np.float32): _prepare_scaled,
+}
 
+
+@functools.lru_cache(maxsize=64)
+def _empty_encoded(shape: Tuple[int, ...]) -> str:
+    """Base64 PNG of an all-zero mask, computed once per resolution"""
+    ok, png = cv2.imencode(".png", np.zeros(shape, dtype=np.uint8), _PNG_PARAMS)
+    return base64.b64encode(png).decode("utf-8")
+
+
+def encode_mask(mask_array: np.ndarray) -> str:
+    """Encode numpy mask array to base64 PNG string with validation"""
     if mask_array.size == 0:
         logger.error("encode_mask: Empty mask array! Creating default empty mask.")
         mask_array = np.zeros((480, 640), dtype=np.uint8)
 
-    # Validate and clip mask values to valid range
-    if mask_array.dtype != np.uint8:
-        # Check range before conversion
-        if mask_array.max() > 255 or mask_array.min() < 0:
-            logger.warning(f"encode_mask: Mask has invalid range [{mask_array.min()}, {mask_array.max()}], clipping to [0, 255]")
-            mask_array = np.clip(mask_array, 0, 255)
-        mask_array = (mask_array * 255).astype(np.uint8)
+    prepare = _MASK_PREPARERS.get(mask_array.dtype, _prepare_scaled)
+    return encode_mask_fast(prepare(mask_array))
+
+
+def encode_mask_fast(mask_array: np.ndarray) -> str:
+    """
+    Encode a known-clean uint8 or bool mask to a base64 PNG string.
+
+    Skips encode_mask's validation; use it for masks produced by the predictor,
+    which are always bool/uint8 and NaN-free.
+    """
+    # OPTIMIZATION: Objects off-screen yield all-zero masks; reuse the cached encoding
+    if not mask_array.any():
+        return _empty_encoded(mask_array.shape)
+
+    if mask_array.dtype == np.bool_:
+        mask_array = _prepare_bool(mask_array)
+
+    ok, png = cv2.imencode(".png", mask_array, _PNG_PARAMS)
+    if not ok:
+        raise RuntimeError("cv2.imencode failed to encode mask as PNG")
+    return base64.b64encode(png).decode("utf-8")
+
 
-    # Final validation: ensure uint8 mask is in valid range
-    if mask_array.max() > 255 or mask_array.min() < 0:
-        logger.warning(f"encode_mask: Final mask out of range, clipping")
-        mask_array = np.clip(mask_array, 0, 255).astype(np.uint8)
+def encode_mask_rle(mask_array: np.ndarray) -> Dict[str, Any]:
+    """
+    Encode a mask as COCO-style RLE (any nonzero pixel is foreground).
 
-    mask_image = Image.fromarray(mask_array, mode="L")
-    buffer = io.BytesIO()
-    mask_image.save(buffer, format="PNG", optimize=True)  # Add optimize=True for smaller size
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    Skips the PNG/Deflate pass and base64 entirely; binary masks are typically
+    5-20x smaller than their PNG encoding.
+    """
+    return mask_to_rle(mask_array)
 
 
-def decode_mask(mask_b64: str) -> np.ndarray:
-    """Decode base64 PNG string to numpy mask array"""
+def decode_mask(mask_b64: Union[str, Dict[str, Any]]) -> np.ndarray:
+    """Decode base64 PNG string (or an RLE dict) to numpy mask array"""
+    if isinstance(mask_b64, dict):
+        return rle_to_mask(mask_b64)
     mask_bytes = base64.b64decode(mask_b64)
     mask_image = Image.open(io.BytesIO(mask_bytes))
     return np.array(mask_image)
@@ -11,16 +11,20 @@ This script tests the SAM 2 video predictor locally to verify:
 
 Usage:
     python test_sam2_local.py --video sample.mp4 --output ./masks/
+    python test_sam2_local.py --video sample.mp4 --output ./masks/ --archive    # Single masks.npz
     python test_sam2_local.py --video sample.mp4 --output ./masks/ --simulate  # Test without GPU
 """
 
 import argparse
 import asyncio
 import os
+import queue
 import sys
+import threading
 import time
 from pathlib import Path
 
+import cv2
 import numpy as np
 from PIL import Image
 
@@ -29,38 +33,109 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from core.sam2_video_predictor import SAM2VideoPredictor  # noqa: E402
 
+try:
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def _composite_kernel(masks, colors, out):
+        """Color each pixel with its last covering object; rows run in parallel"""
+        n, h, w = masks.shape
+        for y in prange(h):
+            for x in range(w):
+                for i in range(n - 1, -1, -1):
+                    if masks[i, y, x]:
+                        out[y, x, 0] = colors[i, 0]
+                        out[y, x, 1] = colors[i, 1]
+                        out[y, x, 2] = colors[i, 2]
+                        break
+
+
+# Per-thread scratch buffer for save_mask (masks are saved from a thread pool)
+_TLS = threading.local()
+
+
+def _mask_buffer(shape) -> np.ndarray:
+    """Return this thread's reusable bool mask buffer, reallocated only on shape change"""
+    buf = getattr(_TLS, "buf", None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=bool)
+        _TLS.buf = buf
+    return buf
+
 
 def save_mask(mask: np.ndarray, output_path: Path, frame_idx: int, object_id: int):
-    """Save a mask as a PNG file"""
-    # Convert binary mask to image (0 or 255)
-    mask_image = Image.fromarray((mask * 255).astype(np.uint8), mode="L")
+    """Save a mask as a 1-bit PNG file (reads back as 0/255 when converted to "L")"""
+    # OPTIMIZATION: threshold into a reused buffer instead of allocating mask > 0 per frame
+    buf = _mask_buffer(mask.shape)
+    np.greater(mask, 0, out=buf)
+    # Mode "1" image (1 bit per pixel, so zlib sees 8x fewer bytes) read from one byte per pixel
+    h, w = buf.shape
+    mask_image = Image.frombuffer("1", (w, h), buf, "raw", "1;8", 0, 1)
 
     filename = f"frame_{frame_idx:06d}_obj_{object_id}.png"
-    mask_image.save(output_path / filename)
+    # Binary masks compress almost as well at level 1, several times faster
+    mask_image.save(output_path / filename, compress_level=1)
     return filename
 
 
 def save_composite_mask(masks: dict, output_path: Path, frame_idx: int, colors: dict):
-    """Save a colored composite mask with all objects"""
+    """Save a colored composite mask with all objects as a JPEG preview"""
     if not masks:
         return None
 
+    # Composites are built directly in BGR for cv2.imwrite
+    bgr = {obj_id: tuple(colors.get(obj_id, (255, 255, 255)))[::-1] for obj_id in masks}
+
     # Get dimensions from first mask
     first_mask = next(iter(masks.values()))
     h, w = first_mask.shape
 
-    # Create RGB composite
-    composite = np.zeros((h, w, 3), dtype=np.uint8)
+    if NUMBA_AVAILABLE:
+        # OPTIMIZATION: One compiled parallel pass over the (N, H, W) mask stack
+        mask_stack = np.stack([np.asarray(mask, dtype=np.uint8) for mask in masks.values()])
+        color_table = np.array([bgr[obj_id] for obj_id in masks], dtype=np.uint8)
+        composite = np.zeros((h, w, 3), dtype=np.uint8)
+        _composite_kernel(mask_stack, color_table, composite)
+    else:
+        # OPTIMIZATION: Paint object indices into one label map (later objects win, as
+        # before) and color it with a single gather from a per-object color LUT
+        label = np.zeros((h, w), dtype=np.uint8 if len(masks) < 256 else np.uint16)
+        lut = np.zeros((len(masks) + 1, 3), dtype=np.uint8)
+        for i, (obj_id, mask) in enumerate(masks.items(), 1):
+            label[mask > 0] = i
+            lut[i] = bgr[obj_id]
+        composite = lut[label]
+
+    # Composites are visual aids only, so lossy JPEG is fine and encodes much faster than PNG
+    filename = f"frame_{frame_idx:06d}_composite.jpg"
+    cv2.imwrite(str(output_path / filename), composite, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return filename
 
-    for obj_id, mask in masks.items():
-        color = colors.get(obj_id, (255, 255, 255))
-        # Apply color where mask is 1
-        for c in range(3):
-            composite[:, :, c] = np.where(mask > 0, color[c], composite[:, :, c])
 
-    composite_image = Image.fromarray(composite, mode="RGB")
-    filename = f"frame_{frame_idx:06d}_composite.png"
-    composite_image.save(output_path / filename)
+def save_mask_archive(session, output_path: Path) -> str:
+    """
+    Save every object's masks into one compressed masks.npz archive
+
+    Masks are taken straight from each object's bit-packed MaskStore (np.packbits rows
+    over H*W), so there is no per-frame encode and only a single file is opened.
+    Keys: shape=[h, w], obj_<id>=(n, ceil(h*w/8)) uint8, obj_<id>_frames=(n,) frame indices.
+    Unpack with np.unpackbits(row, count=h * w).reshape(h, w).
+    """
+    arrays = {"shape": np.array([session.frame_height, session.frame_width])}
+    for obj_id, obj in session.objects.items():
+        frames = obj.mask_frames
+        arrays[f"obj_{obj_id}"] = obj.masks.packed[frames]
+        arrays[f"obj_{obj_id}_frames"] = frames
+
+    filename = "masks.npz"
+    np.savez_compressed(output_path / filename, **arrays)
     return filename
 
 
@@ -72,6 +147,7 @@ async def run_test(
     simulate: bool = False,
     point_x: float = 320,
     point_y: float = 240,
+    archive: bool = False,
 ):
     """Run SAM 2 test"""
 
@@ -149,42 +225,83 @@ async def run_test(
         print(f"  ✗ Failed to add object: {e}")
         return False
 
-    # Propagate masks
-    print("\n[4/5] Propagating masks to all frames...")
-    start_time = time.time()
-
-    try:
-        propagation_result = predictor.propagate_masks(session_id=session.session_id)
-
-        num_frames = len(propagation_result["frames"])
-        print(f"  ✓ Propagated to {num_frames} frames")
-        print(f"  ✓ Propagation completed in {time.time() - start_time:.2f}s")
-    except Exception as e:
-        print(f"  ✗ Failed to propagate masks: {e}")
-        return False
-
-    # Save all masks
-    print("\n[5/5] Saving masks...")
-    start_time = time.time()
-
     # Get object colors
     colors = {}
     for obj_id, obj in session.objects.items():
         colors[obj_id] = obj.color
 
-    saved_count = 0
-    for frame_idx, frame_masks in propagation_result["frames"].items():
-        # Save individual object masks
-        for obj_id, mask in frame_masks.items():
-            save_mask(mask, output_path, frame_idx, obj_id)
-            saved_count += 1
+    # Propagate masks, saving each frame while the next one is being inferred
+    print("\n[4/5] Propagating and saving masks...")
+    start_time = time.time()
 
+    # OPTIMIZATION: PNG encode and file writes release the GIL, so writer threads drain
+    # a bounded queue of frames while propagation continues on this thread. A full
+    # queue blocks propagation (back-pressure) instead of buffering every frame.
+    num_frames = 0
+    write_queue: "queue.Queue" = queue.Queue(maxsize=64)
+    saved_counts = []
+    write_errors = []
+
+    def save_frame(frame_idx: int, frame_masks: dict) -> int:
+        if not archive:
+            for obj_id, mask in frame_masks.items():
+                save_mask(mask, output_path, frame_idx, obj_id)
         # Save composite (every 10th frame to save disk space)
         if frame_idx % 10 == 0:
             save_composite_mask(frame_masks, output_path, frame_idx, colors)
+        return 0 if archive else len(frame_masks)
+
+    def writer():
+        saved = 0
+        while (item := write_queue.get()) is not None:
+            try:
+                saved += save_frame(*item)
+            except Exception as e:
+                write_errors.append(e)
+        saved_counts.append(saved)
+
+    writers = [
+        threading.Thread(target=writer, name=f"mask-writer-{i}", daemon=True)
+        for i in range(min(2, os.cpu_count() or 1))
+    ]
+    for thread in writers:
+        thread.start()
+
+    try:
+        for frame_idx, frame_masks in predictor.iter_propagate_masks(
+            session_id=session.session_id
+        ):
+            num_frames += 1
+            if archive and frame_idx % 10 != 0:
+                continue
+            write_queue.put((frame_idx, frame_masks))
+
+        print(f"  ✓ Propagated to {num_frames} frames in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"  ✗ Failed to propagate masks: {e}")
+        return False
+    finally:
+        # One sentinel per writer, queued behind the remaining frames
+        for _ in writers:
+            write_queue.put(None)
+        for thread in writers:
+            thread.join()
+
+    if write_errors:
+        print(f"  ✗ Failed to save masks: {write_errors[0]}")
+        return False
+    saved_count = sum(saved_counts)
+
+    # Archive all masks
+    print("\n[5/5] Finishing mask output...")
+    if archive:
+        # One packed archive instead of a PNG per frame and object
+        filename = save_mask_archive(session, output_path)
+        saved_count = sum(len(obj.mask_frames) for obj in session.objects.values())
+        print(f"  ✓ Saved: {filename}")
 
-    print(f"  ✓ Saved {saved_count} mask files")
-    print(f"  ✓ Saving completed in {time.time() - start_time:.2f}s")
+    print(f"  ✓ Saved {saved_count} masks")
+    print(f"  ✓ Propagation and saving completed in {time.time() - start_time:.2f}s")
 
     # Cleanup
     predictor.close_session(session.session_id)
@@ -245,6 +362,11 @@ def main():
         default=240,
         help="Y coordinate for initial point prompt (default: 240)",
     )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Save masks to a single bit-packed masks.npz instead of one PNG per frame/object",
+    )
 
     args = parser.parse_args()
 
@@ -263,6 +385,7 @@ def main():
             simulate=args.simulate,
             point_x=args.point_x,
             point_y=args.point_y,
+            archive=args.archive,
         )
     )
 
@@ -1,7 +1,13 @@
+import os
+import threading
+import time
+
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app import crud, models, schemas
 from app.core import security
@@ -12,11 +18,44 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
+# OPTIMIZATION: raw token -> (token expiry, user column values), so steady-state
+# auth skips the JWT verify and the user SELECT. Values (not ORM instances) are
+# cached because every request has its own session.
+_TOKEN_CACHE: TTLCache = TTLCache(
+    maxsize=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+)
+_TOKEN_CACHE_LOCK = threading.RLock()
+
+
+def _cached_user(db: Session, token: str):
+    """Return the user for a recently verified, unexpired token, or None"""
+    with _TOKEN_CACHE_LOCK:
+        hit = _TOKEN_CACHE.get(token)
+    if hit is None:
+        return None
+    expires_at, values = hit
+    if expires_at is not None and expires_at <= time.time():
+        return None
+    user = models.User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def _cache_user(token: str, payload: dict, user: models.User):
+    values = {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[token] = (payload.get("exp"), values)
+
 
 def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> models.User:
+    user = _cached_user(db, token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -35,4 +74,5 @@ def get_current_user(
     user = crud.user.get_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    _cache_user(token, payload, user)
+    return user
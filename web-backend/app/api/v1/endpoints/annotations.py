@@ -1,318 +1,693 @@
+import asyncio
+import io
 import json
-from typing import List
+import struct
+from typing import Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, UploadFile
 from PIL import Image
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.db.database import get_db
-from app.services.annotation_formats import annotation_format_service
+from app.core.colors import category_color
+from app.core.fast_base64 import b64decode
+from app.db.database import get_async_db, get_db
+from app.services.annotation_formats import FormatData, annotation_format_service, decode_mask_data
+from app.services.lookup_cache import lookup_cache
 from app.services.storage_service import storage_service
 
+# Routes on a single annotation, mounted under /annotations
 router = APIRouter()
+# Video/frame-scoped routes, mounted at the API root
+videos_router = APIRouter()
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
-def get_or_create_frame(db: Session, video_id: int, frame_number: int):
+# Whether the Annotation model has annotation_storage_key, checked once instead
+# of inspecting the mapper on every create
+HAS_ANNOTATION_STORAGE_KEY = "annotation_storage_key" in {
+    column.key for column in sa_inspect(models.Annotation).columns
+}
+
+
+async def get_or_create_frame(db: AsyncSession, video_id: int, frame_number: int):
     """Get or create a frame record"""
+    # OPTIMIZATION: frames are immutable once created, so repeat saves on the
+    # same frame skip the SELECT entirely
+    cache_key = ("Frame", video_id, frame_number)
+    cached_frame = await lookup_cache.get_async(db, models.Frame, cache_key)
+    if cached_frame is not None:
+        return cached_frame
+
     # Check if frame already exists
-    existing_frame = (
-        db.query(models.Frame)
-        .filter(
+    result = await db.execute(
+        select(models.Frame).filter(
             models.Frame.video_id == video_id, models.Frame.frame_number == frame_number
         )
-        .first()
     )
+    existing_frame = result.scalars().first()
 
     if existing_frame:
+        lookup_cache.put(cache_key, existing_frame)
         return existing_frame
 
-    # Create new frame record with default dimensions
-    new_frame = models.Frame(
-        video_id=video_id,
-        frame_number=frame_number,
-        width=640,  # Using our standard processing dimensions
-        height=480,
+    # Create new frame record with default dimensions. ON CONFLICT DO NOTHING
+    # RETURNING inserts and loads the row (incl. created_at) in one round-trip.
+    result = await db.scalars(
+        pg_insert(models.Frame)
+        .values(
+            video_id=video_id,
+            frame_number=frame_number,
+            width=640,  # Using our standard processing dimensions
+            height=480,
+        )
+        .on_conflict_do_nothing()
+        .returning(models.Frame)
     )
-    db.add(new_frame)
-    db.commit()
-    db.refresh(new_frame)
+    new_frame = result.first()
+    if new_frame is None:
+        # Inserted concurrently by another request (unique video_id, frame_number)
+        return await get_or_create_frame(db, video_id, frame_number)
+    # Committed with the caller's annotation; not cached until a later lookup
+    # sees it, so a rolled-back frame can never be served from the cache
     return new_frame
 
 
-def get_or_create_category(db: Session, project_id: int, name: str, color: str = None):
+async def get_or_create_category(
+    db: AsyncSession, project_id: int, name: str, color: str = None
+):
     """Get or create a category"""
-    existing_category = (
-        db.query(models.Category)
-        .filter(models.Category.project_id == project_id, models.Category.name == name)
-        .first()
+    # Renames/deletes in projects.py invalidate these entries
+    cache_key = ("Category", project_id, name)
+    cached_category = await lookup_cache.get_async(db, models.Category, cache_key)
+    if cached_category is not None:
+        return cached_category
+
+    result = await db.execute(
+        select(models.Category).filter(
+            models.Category.project_id == project_id, models.Category.name == name
+        )
     )
+    existing_category = result.scalars().first()
 
     if existing_category:
+        lookup_cache.put(cache_key, existing_category)
         return existing_category
 
-    # Create new category with random color if not provided
+    # Create new category with a palette color if not provided
     if not color:
-        import random
-
-        colors = [
-            "#FF6B6B",
-            "#4ECDC4",
-            "#45B7D1",
-            "#96CEB4",
-            "#FFEAA7",
-            "#DDA0DD",
-            "#98D8C8",
-            "#F7DC6F",
-        ]
-        color = random.choice(colors)
+        color = category_color(name)
 
-    new_category = models.Category(project_id=project_id, name=name, color=color)
-    db.add(new_category)
-    db.commit()
-    db.refresh(new_category)
+    result = await db.scalars(
+        pg_insert(models.Category)
+        .values(project_id=project_id, name=name, color=color)
+        .on_conflict_do_nothing()
+        .returning(models.Category)
+    )
+    new_category = result.first()
+    if new_category is None:
+        # Inserted concurrently by another request (unique project_id, name)
+        return await get_or_create_category(db, project_id, name, color)
+    # Committed (and cached on a later lookup) with the caller's transaction
     return new_category
 
 
-class AnnotationRequest(schemas.BaseModel):
+class AnnotationFields(schemas.BaseModel):
+    """Everything in an annotation request except the mask"""
+    # Immutable: batch requests are shared with the concurrent upload threads
+    model_config = {"frozen": True}
+
     category_name: str
-    mask_data: str
     sam_points: str = None
     sam_boxes: str = None
     confidence: float = None
 
 
-@router.post("/videos/{video_id}/frames/{frame_number}/annotations")
-def create_annotation_for_video_frame(
+class AnnotationRequest(AnnotationFields):
+    mask_data: str
+
+
+def _mask_dimensions(mask_data: Union[str, bytes]) -> Tuple[int, int]:
+    """Read width/height from a base64 (or data URL, or raw PNG) mask, defaulting to SAM's 640x480"""
+    # OPTIMIZATION: a PNG's size sits in its IHDR chunk at bytes 16-24, so only
+    # the first 32 base64 chars (24 bytes) need decoding, not the whole mask
+    try:
+        if isinstance(mask_data, bytes):
+            header = mask_data[:24]
+        else:
+            if mask_data.startswith("data:image"):
+                mask_data = mask_data.split(",", 1)[1]
+            header = b64decode(mask_data[:32])
+        if len(header) == 24 and header[:8] == PNG_SIGNATURE:
+            return struct.unpack(">II", header[16:24])
+    except Exception:
+        pass
+
+    # Not a PNG: let PIL identify the format
+    try:
+        with Image.open(io.BytesIO(decode_mask_data(mask_data))) as img:
+            return img.size
+    except Exception:
+        # Use defaults if unable to determine dimensions
+        return 640, 480
+
+
+def _new_annotation(frame, category, request: AnnotationRequest, mask_width: int, mask_height: int):
+    """Build an unsaved annotation; storage keys are filled in once it has an ID"""
+    annotation_data = {
+        "frame_id": frame.id,
+        "category_id": category.id,
+        "sam_points": request.sam_points,
+        "sam_boxes": request.sam_boxes,
+        "confidence": request.confidence,
+        "mask_width": mask_width,
+        "mask_height": mask_height,
+        "mask_storage_key": "",  # Temporary, will be updated after storing
+    }
+
+    # Only add annotation_storage_key if the field exists in the model
+    # This handles cases where database migration hasn't been run yet
+    if HAS_ANNOTATION_STORAGE_KEY:
+        annotation_data["annotation_storage_key"] = ""
+
+    return models.Annotation(**annotation_data)
+
+
+async def _get_video_and_project(db: AsyncSession, video_id: int):
+    """Load a video and its project with one JOIN, or raise 404"""
+    result = await db.execute(
+        select(models.Video, models.Project)
+        .join(models.Project, models.Project.id == models.Video.project_id)
+        .where(models.Video.id == video_id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return row.Video, row.Project
+
+
+def _project_annotation_format(project) -> str:
+    """Project's preferred annotation format (with fallback)"""
+    try:
+        return getattr(project, "annotation_format", "YOLO") or "YOLO"
+    except AttributeError:
+        # annotation_format field doesn't exist yet, use default
+        return "YOLO"
+
+
+def _store_annotation_files(
+    video,
+    frame,
+    frame_number: int,
+    category,
+    annotation,
+    request: AnnotationRequest,
+    annotation_format: str,
+):
+    """Render the annotation file and upload it with the mask, setting the storage keys"""
+    # Prepare annotation data for format conversion
+    format_data = FormatData(
+        category_id=category.id,
+        mask_data=request.mask_data,
+        category_name=category.name,
+    )
+
+    # Size the converter to the actual mask
+    dimensions = {
+        "image_width": annotation.mask_width,
+        "image_height": annotation.mask_height,
+    }
+
+    # Convert to annotation format
+    try:
+        # Pass format-specific parameters
+        if annotation_format.upper() == "COCO":
+            annotation_content = annotation_format_service.convert_annotation(
+                format_data, annotation_format, image_id=frame.id, **dimensions
+            )
+        elif annotation_format.upper() == "PASCAL_VOC":
+            # Pascal VOC needs image filename
+            image_filename = f"frame_{frame_number}.jpg"
+            annotation_content = annotation_format_service.convert_annotation(
+                format_data, annotation_format, image_filename=image_filename, **dimensions
+            )
+        else:
+            # YOLO and other formats don't need extra parameters
+            annotation_content = annotation_format_service.convert_annotation(
+                format_data, annotation_format, **dimensions
+            )
+
+        if not annotation_content.strip():
+            print(
+                f"Warning: Empty annotation content generated for format {annotation_format}"
+            )
+            annotation_content = (
+                f"# No annotation data generated for {annotation_format} format"
+            )
+
+    except Exception as format_error:
+        print(
+            f"Error generating annotation format {annotation_format}: {format_error}"
+        )
+        # Fallback annotation content
+        annotation_content = (
+            f"# Error generating {annotation_format} format: {str(format_error)}"
+        )
+
+    # For now, just store the mask (fallback for when annotation storage isn't available)
+    try:
+        # Try to store both mask and annotation files
+        storage_keys = storage_service.store_mask_and_annotation(
+            project_id=video.project_id,
+            video_id=video.id,
+            frame_number=frame_number,
+            annotation_id=annotation.id,
+            mask_data=request.mask_data,
+            annotation_content=annotation_content,
+            format_type=annotation_format,
+        )
+
+        # Update annotation with storage keys
+        annotation.mask_storage_key = storage_keys["mask_storage_key"]
+
+        # Only set annotation_storage_key if the field exists
+        if HAS_ANNOTATION_STORAGE_KEY:
+            annotation.annotation_storage_key = storage_keys[
+                "annotation_storage_key"
+            ]
+
+    except Exception as storage_error:
+        print(f"Dual storage failed, falling back to mask only: {storage_error}")
+        # Fallback to just storing the mask
+        mask_key = storage_service.store_mask(
+            project_id=video.project_id,
+            video_id=video.id,
+            frame_number=frame_number,
+            annotation_id=annotation.id,
+            mask_data=request.mask_data,
+        )
+        annotation.mask_storage_key = mask_key
+
+
+def _annotation_response(annotation, category, annotation_format: str) -> dict:
+    """Build response with conditional fields"""
+    response = {
+        "id": annotation.id,
+        "frame_id": annotation.frame_id,
+        "category": {
+            "id": category.id,
+            "name": category.name,
+            "color": category.color,
+        },
+        "mask_storage_key": annotation.mask_storage_key,
+        "annotation_format": annotation_format,
+        "created_at": annotation.created_at,
+    }
+
+    # Only include annotation_storage_key if it exists
+    if (
+        HAS_ANNOTATION_STORAGE_KEY
+        and annotation.annotation_storage_key
+    ):
+        response["annotation_storage_key"] = annotation.annotation_storage_key
+
+    return response
+
+
+def _stored_keys(annotations) -> List[str]:
+    """Object keys already uploaded for these (not yet committed) annotations"""
+    keys = []
+    for annotation in annotations:
+        keys.append(annotation.mask_storage_key)
+        if HAS_ANNOTATION_STORAGE_KEY:
+            keys.append(annotation.annotation_storage_key)
+    return [key for key in keys if key]
+
+
+def _forget_lookups(video_id: int):
+    """
+    Drop cached frames of a video and all cached categories after a foreign key
+    failure: another worker may have deleted a row this process still caches.
+    The client's retry then resolves them from the database again.
+    """
+    lookup_cache.invalidate(models.Frame, video_id=video_id)
+    lookup_cache.invalidate(models.Category)
+
+
+def _delete_stored_files(keys: List[str]):
+    """Best-effort cleanup of files whose annotation rows were rolled back"""
+    for key in keys:
+        storage_service.delete_mask(key)
+
+
+@videos_router.post("/videos/{video_id}/frames/{frame_number}/annotations")
+async def create_annotation_for_video_frame(
     video_id: int,
     frame_number: int,
     request: AnnotationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create annotation for a specific video frame"""
-    import base64
-    import io
     import logging
     
     logger = logging.getLogger(__name__)
     logger.info(f"Creating annotation: video_id={video_id}, frame={frame_number}, category={request.category_name}, mask_len={len(request.mask_data) if request.mask_data else 0}")
 
+    # Frame, category and annotation are written in one transaction with a
+    # single COMMIT; files uploaded before a failed commit are removed again
+    annotation = None
+    committed = False
     try:
-        # Get video to find project_id
-        video = db.query(models.Video).filter(models.Video.id == video_id).first()
-        if not video:
-            raise HTTPException(status_code=404, detail="Video not found")
-
-        # Get project to access annotation format
-        project = (
-            db.query(models.Project)
-            .filter(models.Project.id == video.project_id)
-            .first()
-        )
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        # Get video (for project_id) and project (for annotation format) in one query
+        video, project = await _get_video_and_project(db, video_id)
 
         # Get or create frame
-        frame = get_or_create_frame(db, video_id, frame_number)
+        frame = await get_or_create_frame(db, video_id, frame_number)
 
         # Get or create category
-        category = get_or_create_category(db, video.project_id, request.category_name)
+        category = await get_or_create_category(db, video.project_id, request.category_name)
 
-        # Get mask dimensions for metadata
-        mask_width, mask_height = 640, 480  # Default SAM dimensions
-        try:
-            # Try to decode mask data to get actual dimensions
-            mask_data = request.mask_data
-            if mask_data.startswith("data:image"):
-                mask_data = mask_data.split(",")[1]
-            mask_bytes = base64.b64decode(mask_data)
-
-            # Get image dimensions
-            with Image.open(io.BytesIO(mask_bytes)) as img:
-                mask_width, mask_height = img.size
-        except Exception:
-            # Use defaults if unable to determine dimensions
-            pass
+        # OPTIMIZATION: mask decoding, format conversion and the MinIO upload are
+        # blocking, so they run in worker threads while the loop serves other requests
+        mask_width, mask_height = await asyncio.to_thread(_mask_dimensions, request.mask_data)
 
         # Create annotation record first to get ID
-        annotation_data = {
-            "frame_id": frame.id,
-            "category_id": category.id,
-            "sam_points": request.sam_points,
-            "sam_boxes": request.sam_boxes,
-            "confidence": request.confidence,
-            "mask_width": mask_width,
-            "mask_height": mask_height,
-            "mask_storage_key": "",  # Temporary, will be updated after storing
-        }
+        annotation = _new_annotation(frame, category, request, mask_width, mask_height)
+        db.add(annotation)
+        await db.flush()  # Get the ID without committing
 
-        # Only add annotation_storage_key if the field exists in the model
-        # This handles cases where database migration hasn't been run yet
-        try:
-            # Check if the model has the annotation_storage_key field
-            from sqlalchemy import inspect
+        annotation_format = _project_annotation_format(project)
+        await asyncio.to_thread(
+            _store_annotation_files,
+            video, frame, frame_number, category, annotation, request, annotation_format,
+        )
 
-            mapper = inspect(models.Annotation)
-            if "annotation_storage_key" in [column.key for column in mapper.columns]:
-                annotation_data["annotation_storage_key"] = ""
-        except Exception:
-            # If inspection fails, try to create without the field
-            pass
+        await db.commit()
+        committed = True
+        await db.refresh(annotation)
 
-        annotation = models.Annotation(**annotation_data)
-        db.add(annotation)
-        db.flush()  # Get the ID without committing
+        return _annotation_response(annotation, category, annotation_format)
 
-        # Generate annotation in project's preferred format (with fallback)
-        try:
-            annotation_format = getattr(project, "annotation_format", "YOLO") or "YOLO"
-        except AttributeError:
-            # annotation_format field doesn't exist yet, use default
-            annotation_format = "YOLO"
-
-        # Prepare annotation data for format conversion
-        format_data = {
-            "category_id": category.id,
-            "category_name": category.name,
-            "mask_data": request.mask_data,
-            "sam_points": request.sam_points,
-            "sam_boxes": request.sam_boxes,
-            "confidence": request.confidence,
-            "mask_width": mask_width,
-            "mask_height": mask_height,
-        }
+    except Exception as e:
+        orphaned = [] if committed or annotation is None else _stored_keys([annotation])
+        await db.rollback()
+        if orphaned:
+            await asyncio.to_thread(_delete_stored_files, orphaned)
+        if isinstance(e, IntegrityError):
+            _forget_lookups(video_id)
+        raise HTTPException(
+            status_code=400, detail=f"Failed to create annotation: {str(e)}"
+        )
 
-        # Set format service dimensions based on actual mask
-        annotation_format_service.image_width = mask_width
-        annotation_format_service.image_height = mask_height
 
-        # Convert to annotation format
-        try:
-            # Pass format-specific parameters
-            if annotation_format.upper() == "COCO":
-                annotation_content = annotation_format_service.convert_annotation(
-                    format_data, annotation_format, image_id=frame.id
-                )
-            elif annotation_format.upper() == "PASCAL_VOC":
-                # Pascal VOC needs image filename
-                image_filename = f"frame_{frame_number}.jpg"
-                annotation_content = annotation_format_service.convert_annotation(
-                    format_data, annotation_format, image_filename=image_filename
-                )
-            else:
-                # YOLO and other formats don't need extra parameters
-                annotation_content = annotation_format_service.convert_annotation(
-                    format_data, annotation_format
-                )
+@videos_router.post("/videos/{video_id}/frames/{frame_number}/annotations/binary")
+async def create_binary_annotation_for_video_frame(
+    video_id: int,
+    frame_number: int,
+    category_name: str,
+    mask: bytes = Body(..., media_type="application/octet-stream"),
+    sam_points: Optional[str] = None,
+    sam_boxes: Optional[str] = None,
+    confidence: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create annotation for a video frame from a raw PNG request body.
+
+    Same as the JSON endpoint, but skips the base64 round-trip (a third less
+    upload) and its decode; the other fields are query parameters.
+    """
+    # Already-parsed input, so skip validation (mask_data carries bytes here)
+    request = AnnotationRequest.model_construct(
+        category_name=category_name,
+        mask_data=mask,
+        sam_points=sam_points,
+        sam_boxes=sam_boxes,
+        confidence=confidence,
+    )
+    return await create_annotation_for_video_frame(video_id, frame_number, request, db)
+
 
-            if not annotation_content.strip():
-                print(
-                    f"Warning: Empty annotation content generated for format {annotation_format}"
+@videos_router.post("/videos/{video_id}/frames/{frame_number}/annotations/upload")
+async def upload_annotation_for_video_frame(
+    video_id: int,
+    frame_number: int,
+    mask: UploadFile = File(...),
+    payload: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create annotation for a video frame from a multipart form.
+
+    The mask is a raw PNG file part and payload is the JSON of the other
+    AnnotationRequest fields; like the /binary endpoint it avoids base64.
+    """
+    try:
+        fields = AnnotationFields.model_validate_json(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    mask_bytes = await mask.read()
+    # Validated above (mask_data carries bytes here)
+    request = AnnotationRequest.model_construct(**dict(fields), mask_data=mask_bytes)
+    return await create_annotation_for_video_frame(video_id, frame_number, request, db)
+
+
+class FrameAnnotationRequest(AnnotationRequest):
+    frame_number: int
+
+
+async def _resolve_frames(db: AsyncSession, video_id: int, frame_numbers) -> Dict[int, models.Frame]:
+    """Look up (or create) many frames of a video with one IN query and one bulk insert"""
+    frames = {}
+    missing = []
+    for frame_number in frame_numbers:
+        cached_frame = await lookup_cache.get_async(db, models.Frame, ("Frame", video_id, frame_number))
+        if cached_frame is not None:
+            frames[frame_number] = cached_frame
+        else:
+            missing.append(frame_number)
+
+    if missing:
+        existing_frames = await db.execute(
+            select(models.Frame).filter(
+                models.Frame.video_id == video_id, models.Frame.frame_number.in_(missing)
+            )
+        )
+        for frame in existing_frames.scalars():
+            if frame.frame_number not in frames:
+                frames[frame.frame_number] = frame
+                lookup_cache.put(("Frame", video_id, frame.frame_number), frame)
+
+        new_frames = [
+            {"video_id": video_id, "frame_number": frame_number, "width": 640, "height": 480}
+            for frame_number in missing
+            if frame_number not in frames
+        ]
+        if new_frames:
+            # One multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING
+            inserted = await db.scalars(
+                pg_insert(models.Frame)
+                .values(new_frames)
+                .on_conflict_do_nothing()
+                .returning(models.Frame)
+            )
+            frames.update((frame.frame_number, frame) for frame in inserted)
+
+        raced = [n for n in missing if n not in frames]
+        if raced:
+            # Inserted concurrently by another request
+            existing_frames = await db.execute(
+                select(models.Frame).filter(
+                    models.Frame.video_id == video_id, models.Frame.frame_number.in_(raced)
                 )
-                annotation_content = (
-                    f"# No annotation data generated for {annotation_format} format"
+            )
+            frames.update((frame.frame_number, frame) for frame in existing_frames.scalars())
+
+    return frames
+
+
+async def _resolve_categories(db: AsyncSession, project_id: int, names) -> Dict[str, models.Category]:
+    """Look up (or create) many categories of a project with one IN query and one bulk insert"""
+    categories = {}
+    missing = []
+    for name in names:
+        cached_category = await lookup_cache.get_async(db, models.Category, ("Category", project_id, name))
+        if cached_category is not None:
+            categories[name] = cached_category
+        else:
+            missing.append(name)
+
+    if missing:
+        existing_categories = await db.execute(
+            select(models.Category).filter(
+                models.Category.project_id == project_id, models.Category.name.in_(missing)
+            )
+        )
+        for category in existing_categories.scalars():
+            if category.name not in categories:
+                categories[category.name] = category
+                lookup_cache.put(("Category", project_id, category.name), category)
+
+        new_categories = [
+            {"project_id": project_id, "name": name, "color": category_color(name)}
+            for name in missing
+            if name not in categories
+        ]
+        if new_categories:
+            # One multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING
+            inserted = await db.scalars(
+                pg_insert(models.Category)
+                .values(new_categories)
+                .on_conflict_do_nothing()
+                .returning(models.Category)
+            )
+            categories.update((category.name, category) for category in inserted)
+
+        raced = [name for name in missing if name not in categories]
+        if raced:
+            # Inserted concurrently by another request
+            existing_categories = await db.execute(
+                select(models.Category).filter(
+                    models.Category.project_id == project_id, models.Category.name.in_(raced)
                 )
-
-        except Exception as format_error:
-            print(
-                f"Error generating annotation format {annotation_format}: {format_error}"
             )
-            # Fallback annotation content
-            annotation_content = (
-                f"# Error generating {annotation_format} format: {str(format_error)}"
+            categories.update(
+                (category.name, category) for category in existing_categories.scalars()
             )
 
-        # For now, just store the mask (fallback for when annotation storage isn't available)
-        try:
-            # Try to store both mask and annotation files
-            storage_keys = storage_service.store_mask_and_annotation(
-                project_id=video.project_id,
-                video_id=video_id,
-                frame_number=frame_number,
-                annotation_id=annotation.id,
-                mask_data=request.mask_data,
-                annotation_content=annotation_content,
-                format_type=annotation_format,
-            )
+    return categories
 
-            # Update annotation with storage keys
-            annotation.mask_storage_key = storage_keys["mask_storage_key"]
-
-            # Only set annotation_storage_key if the field exists
-            if hasattr(annotation, "annotation_storage_key"):
-                annotation.annotation_storage_key = storage_keys[
-                    "annotation_storage_key"
-                ]
-
-        except Exception as storage_error:
-            print(f"Dual storage failed, falling back to mask only: {storage_error}")
-            # Fallback to just storing the mask
-            mask_key = storage_service.store_mask(
-                project_id=video.project_id,
-                video_id=video_id,
-                frame_number=frame_number,
-                annotation_id=annotation.id,
-                mask_data=request.mask_data,
-            )
-            annotation.mask_storage_key = mask_key
 
-        db.commit()
-        db.refresh(annotation)
+@videos_router.post("/videos/{video_id}/annotations:batch")
+async def create_annotations_batch(
+    video_id: int,
+    requests: List[FrameAnnotationRequest],
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create annotations on many frames of a video in a single transaction.
 
-        # Build response with conditional fields
-        response = {
-            "id": annotation.id,
-            "frame_id": annotation.frame_id,
-            "category": {
-                "id": category.id,
-                "name": category.name,
-                "color": category.color,
-            },
-            "mask_storage_key": annotation.mask_storage_key,
-            "annotation_format": annotation_format,
-            "created_at": annotation.created_at,
-        }
+    Frames and categories are resolved in bulk and everything is committed
+    once, instead of one commit per mask as with the per-frame endpoint.
+    """
+    import logging
 
-        # Only include annotation_storage_key if it exists
-        if (
-            hasattr(annotation, "annotation_storage_key")
-            and annotation.annotation_storage_key
-        ):
-            response["annotation_storage_key"] = annotation.annotation_storage_key
+    logger = logging.getLogger(__name__)
+    logger.info(f"Creating {len(requests)} annotations in batch: video_id={video_id}")
+
+    if not requests:
+        return []
+
+    annotations = []
+    committed = False
+    try:
+        video, project = await _get_video_and_project(db, video_id)
+
+        frames = await _resolve_frames(db, video_id, {r.frame_number for r in requests})
+        categories = await _resolve_categories(
+            db, video.project_id, {r.category_name for r in requests}
+        )
+        dimensions = await asyncio.to_thread(
+            lambda: [_mask_dimensions(request.mask_data) for request in requests]
+        )
+        annotations = [
+            _new_annotation(
+                frames[request.frame_number],
+                categories[request.category_name],
+                request,
+                mask_width,
+                mask_height,
+            )
+            for request, (mask_width, mask_height) in zip(requests, dimensions)
+        ]
+        db.add_all(annotations)
+        await db.flush()  # Get all IDs without committing
+
+        annotation_format = _project_annotation_format(project)
+
+        # OPTIMIZATION: upload every annotation's files concurrently; the
+        # batch takes roughly as long as its slowest upload, not their sum.
+        # Every upload is waited for, so the cleanup below sees all their keys.
+        results = await asyncio.gather(*(
+            asyncio.to_thread(
+                _store_annotation_files,
+                video,
+                frames[request.frame_number],
+                request.frame_number,
+                categories[request.category_name],
+                annotation,
+                request,
+                annotation_format,
+            )
+            for request, annotation in zip(requests, annotations)
+        ), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        await db.commit()
+        committed = True
+
+        # Load server defaults (created_at) in one query rather than one refresh per annotation
+        await db.execute(
+            select(models.Annotation)
+            .filter(models.Annotation.id.in_([a.id for a in annotations]))
+            .execution_options(populate_existing=True)
+        )
 
-        return response
+        return [
+            _annotation_response(annotation, categories[request.category_name], annotation_format)
+            for request, annotation in zip(requests, annotations)
+        ]
 
     except Exception as e:
-        db.rollback()
+        orphaned = [] if committed else _stored_keys(annotations)
+        await db.rollback()
+        if orphaned:
+            await asyncio.to_thread(_delete_stored_files, orphaned)
+        if isinstance(e, IntegrityError):
+            _forget_lookups(video_id)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
-            status_code=400, detail=f"Failed to create annotation: {str(e)}"
+            status_code=400, detail=f"Failed to create annotations: {str(e)}"
         )
 
 
-@router.get("/videos/{video_id}/frames/{frame_number}/annotations")
-def get_annotations_for_video_frame(
+@videos_router.post("/videos/{video_id}/frames/{frame_number}/annotations:batch")
+async def create_frame_annotations_batch(
     video_id: int,
     frame_number: int,
-    db: Session = Depends(get_db),
+    requests: List[AnnotationRequest],
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get all annotations for a specific video frame"""
-    # Find the frame by video_id and frame_number
-    frame = (
-        db.query(models.Frame)
-        .filter(
-            models.Frame.video_id == video_id, models.Frame.frame_number == frame_number
-        )
-        .first()
-    )
+    """Create many annotations on one frame in a single transaction (see create_annotations_batch)"""
+    # Already validated; model_construct avoids re-validating (and copying) every mask
+    frame_requests = [
+        FrameAnnotationRequest.model_construct(**dict(request), frame_number=frame_number)
+        for request in requests
+    ]
+    return await create_annotations_batch(video_id, frame_requests, db)
 
-    if not frame:
-        # No frame record = no annotations yet
-        return []
 
-    # Get all annotations for this frame
-    annotations = crud.annotation.get_by_frame(db=db, frame_id=frame.id)
+@videos_router.get("/videos/{video_id}/frames/{frame_number}/annotations")
+async def get_annotations_for_video_frame(
+    video_id: int,
+    frame_number: int,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get all annotations for a specific video frame"""
+    # Get all annotations for this frame (none if there is no frame record yet)
+    annotations = await crud.annotation.get_by_video_frame_async(
+        db=db, video_id=video_id, frame_number=frame_number
+    )
 
     # Return annotations with mask data
     result = []
@@ -343,17 +718,15 @@ def get_annotations_for_video_frame(
     return result
 
 
-@router.get("/annotations/{annotation_id}/mask")
-def get_annotation_mask_data(
+@videos_router.get("/annotations/{annotation_id}/mask")
+async def get_annotation_mask_data(
     annotation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get the actual mask image data for an annotation"""
-    import base64
-
-    from fastapi.responses import Response
+    from fastapi.responses import StreamingResponse
 
-    annotation = crud.annotation.get(db=db, id=annotation_id)
+    annotation = await crud.annotation.get_async(db=db, id=annotation_id)
     if not annotation:
         raise HTTPException(status_code=404, detail="Annotation not found")
 
@@ -363,26 +736,40 @@ def get_annotation_mask_data(
         )
 
     try:
-        # Get the mask data from MinIO
-        mask_bytes = storage_service.get_mask_data(annotation.mask_storage_key)
+        # OPTIMIZATION: stream the PNG from MinIO in 64 KB chunks instead of
+        # buffering the whole object, so memory per download stays constant.
+        # Opening the object up front turns a missing key into a 500 here
+        # rather than a truncated body mid-stream.
+        mask_object = await asyncio.to_thread(
+            storage_service.open_mask_stream, annotation.mask_storage_key
+        )
+
+        headers = {}
+        content_length = mask_object.headers.get("Content-Length")
+        if content_length is not None:
+            headers["Content-Length"] = content_length
 
         # Return as PNG image
-        return Response(content=mask_bytes, media_type="image/png")
+        return StreamingResponse(
+            storage_service.iter_mask(mask_object),
+            media_type="image/png",
+            headers=headers,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to retrieve mask: {str(e)}"
         )
 
 
-@router.get("/frames/{frame_id}/annotations", response_model=List[schemas.Annotation])
-def read_frame_annotations(
+@videos_router.get("/frames/{frame_id}/annotations", response_model=List[schemas.Annotation])
+async def read_frame_annotations(
     frame_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
 ):
     # TODO: Add authorization check through video -> project -> owner
-    annotations = crud.annotation.get_by_frame(
+    annotations = await crud.annotation.get_by_frame_async(
         db=db, frame_id=frame_id, skip=skip, limit=limit
     )
     return annotations
@@ -431,27 +818,50 @@ def get_annotation_file_url(
         )
 
 
-@router.post("/frames/{frame_id}/annotations", response_model=schemas.Annotation)
+@videos_router.post("/frames/{frame_id}/annotations", response_model=schemas.Annotation)
 def create_annotation(
     frame_id: int,
     annotation_in: schemas.AnnotationCreate,
     db: Session = Depends(get_db),
 ):
-    import base64
-    import gzip
+    frame = db.query(models.Frame).filter(models.Frame.id == frame_id).first()
+    if not frame:
+        raise HTTPException(status_code=404, detail="Frame not found")
 
+    annotation = None
+    committed = False
     try:
-        # Decode base64 mask data and compress it for storage
-        mask_bytes = base64.b64decode(annotation_in.mask_data)
-        compressed_mask = gzip.compress(mask_bytes)
+        # OPTIMIZATION: the mask is a PNG (already deflated), so it is stored in
+        # object storage as-is like every other annotation, with no gzip pass
+        mask_bytes = decode_mask_data(annotation_in.mask_data)
+        mask_width, mask_height = _mask_dimensions(mask_bytes)
+
+        annotation = models.Annotation(
+            **annotation_in.model_dump(exclude={"mask_data", "mask_width", "mask_height"}),
+            frame_id=frame_id,
+            mask_width=annotation_in.mask_width or mask_width,
+            mask_height=annotation_in.mask_height or mask_height,
+            mask_storage_key="",  # Set once the mask is stored
+        )
+        db.add(annotation)
+        db.flush()  # Get the ID without committing
 
-        # Create annotation with compressed mask data
-        annotation = crud.annotation.create_with_frame(
-            db=db, obj_in=annotation_in, frame_id=frame_id, mask_data=compressed_mask
+        annotation.mask_storage_key = storage_service.store_mask(
+            project_id=frame.video.project_id,
+            video_id=frame.video_id,
+            frame_number=frame.frame_number,
+            annotation_id=annotation.id,
+            mask_data=mask_bytes,
         )
+        db.commit()
+        committed = True
+        db.refresh(annotation)
         return annotation
 
     except Exception as e:
+        orphaned = [] if committed or annotation is None else _stored_keys([annotation])
+        db.rollback()
+        _delete_stored_files(orphaned)
         raise HTTPException(status_code=400, detail=f"Invalid mask data: {str(e)}")
 
 
@@ -1,11 +1,9 @@
 from typing import Literal
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import base64
 import cv2
 import numpy as np
-from io import BytesIO
-from PIL import Image
+from app.core.fast_base64 import b64decode, b64encode_str
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,38 +35,44 @@ def adjust_mask(request: MaskAdjustmentRequest):
         
         # Decode base64 mask data
         try:
-            mask_bytes = base64.b64decode(request.mask_data)
-            mask_image = Image.open(BytesIO(mask_bytes))
-            mask_array = np.array(mask_image)
+            mask_bytes = b64decode(request.mask_data)
+            # Decode straight to a single-channel uint8 array (any PNG color type)
+            mask_array = cv2.imdecode(np.frombuffer(mask_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid mask data: {str(e)}")
-        
-        # Convert to grayscale if needed
-        if len(mask_array.shape) == 3:
-            mask_array = cv2.cvtColor(mask_array, cv2.COLOR_RGB2GRAY)
+        if mask_array is None:
+            raise HTTPException(status_code=400, detail="Invalid mask data: could not decode image")
         
         # Convert to binary mask (threshold at 128)
         _, mask_binary = cv2.threshold(mask_array, 128, 255, cv2.THRESH_BINARY)
         
-        logger.info(f"Mask shape: {mask_binary.shape}, unique values: {np.unique(mask_binary)}")
-        logger.info(f"Non-zero pixels before adjustment: {np.count_nonzero(mask_binary)}")
+        # OPTIMIZATION: np.unique sorts the whole mask and count_nonzero is another
+        # full pass, so these diagnostics only run when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Mask shape: {mask_binary.shape}, unique values: {np.unique(mask_binary)}")
+            logger.debug(f"Non-zero pixels before adjustment: {np.count_nonzero(mask_binary)}")
         
-        # Create kernel for morphological operations
-        kernel = np.ones((request.amount, request.amount), np.uint8)
+        # OPTIMIZATION: expand/contract by an amount x amount square equals thresholding
+        # the chessboard distance at amount // 2, one O(pixels) pass for any amount
+        radius = request.amount // 2
         
         # Apply the requested adjustment
         if request.adjustment_type == "expand":
-            # Dilate to expand the mask
-            adjusted_mask = cv2.dilate(mask_binary, kernel, iterations=1)
+            # Dilate to expand the mask: background within radius of the mask joins it
+            dist = cv2.distanceTransform(cv2.bitwise_not(mask_binary), cv2.DIST_C, 3)
+            adjusted_mask = (dist <= radius).astype(np.uint8) * 255
             logger.info("Applied dilation (expand)")
             
         elif request.adjustment_type == "contract":
-            # Erode to contract the mask
-            adjusted_mask = cv2.erode(mask_binary, kernel, iterations=1)
+            # Erode to contract the mask: keep pixels more than radius from the background
+            dist = cv2.distanceTransform(mask_binary, cv2.DIST_C, 3)
+            adjusted_mask = (dist > radius).astype(np.uint8) * 255
             logger.info("Applied erosion (contract)")
             
         elif request.adjustment_type == "smooth":
-            # Apply opening followed by closing to smooth the mask
+            # Apply opening followed by closing to smooth the mask. A MORPH_RECT
+            # element is run as two separable 1D passes (row max/min, then column)
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (request.amount, request.amount))
             adjusted_mask = cv2.morphologyEx(mask_binary, cv2.MORPH_OPEN, kernel)
             adjusted_mask = cv2.morphologyEx(adjusted_mask, cv2.MORPH_CLOSE, kernel)
             logger.info("Applied morphological opening + closing (smooth)")
@@ -76,13 +80,15 @@ def adjust_mask(request: MaskAdjustmentRequest):
         else:
             raise HTTPException(status_code=400, detail="Invalid adjustment type")
         
-        logger.info(f"Non-zero pixels after adjustment: {np.count_nonzero(adjusted_mask)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Non-zero pixels after adjustment: {np.count_nonzero(adjusted_mask)}")
         
-        # Convert back to PIL Image and then to base64
-        adjusted_image = Image.fromarray(adjusted_mask, mode='L')
-        buffer = BytesIO()
-        adjusted_image.save(buffer, format='PNG')
-        adjusted_base64 = base64.b64encode(buffer.getvalue()).decode()
+        # Encode the uint8 mask to PNG directly with libpng; binary masks compress
+        # almost as well at level 1 as at PIL's default 6, several times faster
+        ok, buffer = cv2.imencode('.png', adjusted_mask, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            raise RuntimeError("PNG encoding failed")
+        adjusted_base64 = b64encode_str(buffer)
         
         processing_time = time.time() - start_time
         logger.info(f"Mask adjustment completed in {processing_time:.3f}s")
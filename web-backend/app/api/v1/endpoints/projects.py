@@ -1,20 +1,100 @@
+import asyncio
+import json
 import os
 import shutil
+import subprocess
+from fractions import Fraction
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.core.colors import category_color
 from app.core.config import settings
 from app.db.database import get_db
+from app.services.lookup_cache import lookup_cache
 
 router = APIRouter()
 
 
+# ffprobe (from ffmpeg) is optional; without it metadata comes from OpenCV
+FFPROBE_PATH = shutil.which(os.getenv("FFPROBE_BINARY", "ffprobe"))
+FFPROBE_AVAILABLE = FFPROBE_PATH is not None
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """ffprobe frame rate such as '30000/1001' as a float (0 if unknown)"""
+    try:
+        return float(Fraction(rate))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _probe_video_metadata(file_path: str) -> Optional[dict]:
+    """
+    Read video metadata from the container headers with ffprobe.
+
+    Returns None when ffprobe is unavailable or the headers don't carry a
+    frame count (or a duration to derive it from).
+    """
+    if not FFPROBE_AVAILABLE:
+        return None
+
+    result = subprocess.run(
+        [
+            FFPROBE_PATH, "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=avg_frame_rate,r_frame_rate,nb_frames,width,height,duration:format=duration",
+            "-of", "json",
+            file_path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=True,
+    )
+    probe = json.loads(result.stdout)
+    streams = probe.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+
+    fps = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+    # Matroska/WebM only record the duration on the container
+    duration = stream.get("duration") or probe.get("format", {}).get("duration")
+    duration = float(duration) if duration not in (None, "N/A") else None
+
+    nb_frames = stream.get("nb_frames")
+    if nb_frames is not None and str(nb_frames).isdigit():
+        total_frames = int(nb_frames)
+    elif duration and fps > 0:
+        total_frames = round(duration * fps)
+    else:
+        return None
+
+    return {
+        'fps': fps,
+        'total_frames': total_frames,
+        'width': int(stream.get("width") or 0),
+        'height': int(stream.get("height") or 0),
+        'duration': total_frames / fps if fps > 0 else duration
+    }
+
+
 def process_video_metadata(file_path: str) -> dict:
-    """Extract metadata from video file using OpenCV"""
+    """Extract metadata from video file headers with ffprobe, falling back to OpenCV"""
+    # OPTIMIZATION: ffprobe only parses the container headers, where
+    # cv2.VideoCapture initialises a decoder (and may scan the file) just to
+    # report the same four numbers
+    try:
+        metadata = _probe_video_metadata(file_path)
+        if metadata is not None:
+            return metadata
+    except Exception as e:
+        print(f"ffprobe failed, falling back to OpenCV: {e}")
+
     try:
         import cv2  # Import cv2 only when needed
         cap = cv2.VideoCapture(file_path)
@@ -78,15 +158,12 @@ def create_project(
 
         # Create categories if provided
         if categories:
-            import random
-            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8', '#F7DC6F']
-
-            for category_name in categories:
-                color = random.choice(colors)
+            # Names are unique per project, drop repeats but keep order
+            for category_name in dict.fromkeys(categories):
                 category = models.Category(
                     project_id=project.id,
                     name=category_name,
-                    color=color
+                    color=category_color(category_name)
                 )
                 db.add(category)
 
@@ -139,12 +216,8 @@ def create_category(
     if category_in.color and not category_in.color.startswith('#'):
         raise HTTPException(status_code=400, detail="Color must be in hex format (e.g., #FF6B6B)")
 
-    # Assign random color if not provided
-    color = category_in.color
-    if not color:
-        import random
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8', '#F7DC6F']
-        color = random.choice(colors)
+    # Assign a palette color if not provided
+    color = category_in.color or category_color(category_in.name)
 
     category = models.Category(
         project_id=project_id,
@@ -199,6 +272,7 @@ def update_category(
 
     db.commit()
     db.refresh(category)
+    lookup_cache.invalidate(models.Category, id=category_id)
     return category
 
 
@@ -243,6 +317,7 @@ def delete_category(
     # Delete category
     db.delete(category)
     db.commit()
+    lookup_cache.invalidate(models.Category, id=category_id)
 
     return {"message": f"Category '{category.name}' deleted successfully", "annotations_deleted": annotation_count}
 
@@ -275,6 +350,14 @@ def read_project_videos(
     return videos
 
 
+def _save_upload(source, file_path: Path):
+    """Write an uploaded video to disk and read its metadata; returns (file_size, metadata)"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+    return file_path.stat().st_size, process_video_metadata(str(file_path))
+
+
 @router.post("/{project_id}/videos", response_model=schemas.Video)
 async def upload_video(
     project_id: int,
@@ -310,13 +393,9 @@ async def upload_video(
 
     # Save file
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        file_size = file_path.stat().st_size
-
-        # Process video metadata
-        metadata = process_video_metadata(str(file_path))
+        # OPTIMIZATION: copying a multi-GB upload and probing it with OpenCV would
+        # block the event loop (and every other request) in this async endpoint
+        file_size, metadata = await asyncio.to_thread(_save_upload, file.file, file_path)
 
         # Create video record
         video_create = schemas.VideoCreate(
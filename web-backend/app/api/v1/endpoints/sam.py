@@ -1,11 +1,23 @@
-from typing import List, Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+import hashlib
+import os
+import struct
+import threading
 import time
 import logging
 
+from app.core.fast_base64 import b64decode
 from app.core.sam_model import SAMModel
 
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -13,6 +25,34 @@ router = APIRouter()
 # Global SAM model instance
 sam_model: Optional[SAMModel] = None
 
+# Recent predictions keyed by image + prompt fingerprint (see _get_cache_key)
+_RESULT_CACHE_SIZE = 32
+_result_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+# Sync endpoints run concurrently in the threadpool, so every cache access holds this
+_result_cache_lock = threading.Lock()
+
+
+# Concurrent SAM forward passes; extra requests wait up to SAM_QUEUE_TIMEOUT seconds, then get 429
+_GPU_SLOTS = threading.BoundedSemaphore(int(os.getenv("SAM_MAX_INFLIGHT", "1")))
+_GPU_QUEUE_TIMEOUT = float(os.getenv("SAM_QUEUE_TIMEOUT", "30"))
+
+
+def _acquire_gpu_slot():
+    """Wait for a free inference slot or reject with 429 so requests don't thrash the GPU"""
+    if not _GPU_SLOTS.acquire(timeout=_GPU_QUEUE_TIMEOUT):
+        raise HTTPException(
+            status_code=429,
+            detail="SAM model busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _new_hasher():
+    """SIMD-accelerated BLAKE3 when installed, otherwise hashlib's BLAKE2b (faster than MD5)"""
+    if BLAKE3_AVAILABLE:
+        return blake3.blake3()
+    return hashlib.blake2b(digest_size=16)
+
 
 class PointPrompt(BaseModel):
     x: float
@@ -33,6 +73,23 @@ class SAMPredictionRequest(BaseModel):
     points: Optional[List[PointPrompt]] = None
     boxes: Optional[List[BoxPrompt]] = None
 
+    _image_bytes: Optional[bytes] = PrivateAttr(default=None)
+    _image_hash: Optional[bytes] = PrivateAttr(default=None)
+
+    def get_image(self) -> bytes:
+        """Decode the base64 image once, hashing the raw bytes as a side effect"""
+        if self._image_bytes is None:
+            self._image_bytes = b64decode(self.image_data)
+            hasher = _new_hasher()
+            hasher.update(self._image_bytes)
+            self._image_hash = hasher.digest()
+        return self._image_bytes
+
+    @property
+    def image_hash(self) -> bytes:
+        self.get_image()
+        return self._image_hash
+
 
 class SAMPredictionResponse(BaseModel):
     mask: str
@@ -41,6 +98,15 @@ class SAMPredictionResponse(BaseModel):
     cached: bool = False
 
 
+class SAMBatchPredictionRequest(BaseModel):
+    requests: List[SAMPredictionRequest]
+
+
+class SAMBatchPredictionResponse(BaseModel):
+    results: List[SAMPredictionResponse]
+    processing_time: float
+
+
 def get_sam_model():
     """Get or initialize the SAM model"""
     global sam_model
@@ -51,6 +117,44 @@ def get_sam_model():
     return sam_model
 
 
+def _cached_result(cache_key: str) -> Optional[Tuple[str, float]]:
+    """Return a cached (mask, confidence) and mark it recently used, or None"""
+    with _result_cache_lock:
+        cached_result = _result_cache.get(cache_key)
+        if cached_result is not None:
+            _result_cache.move_to_end(cache_key)
+        return cached_result
+
+
+def _cache_result(cache_key: str, mask_base64: str, confidence: float):
+    """Store a prediction, evicting the least recently used entry when full"""
+    # Only cache real predictions, not the empty fallback mask
+    if confidence > 0:
+        with _result_cache_lock:
+            _result_cache[cache_key] = (mask_base64, confidence)
+            _result_cache.move_to_end(cache_key)
+            if len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+
+
+def _get_cache_key(request: SAMPredictionRequest) -> str:
+    """
+    Build a cache key from the image digest and a packed prompt fingerprint.
+
+    The image is hashed once when decoded, so the key only costs
+    O(prompt size) instead of re-hashing the multi-MB base64 payload.
+    """
+    h = _new_hasher()
+    h.update(request.image_hash)
+    h.update(request.prompt_type.encode())
+    for p in request.points or []:
+        h.update(struct.pack("<dd?", p.x, p.y, p.is_positive))
+    h.update(b"|")
+    for b in request.boxes or []:
+        h.update(struct.pack("<dddd", b.x1, b.y1, b.x2, b.y2))
+    return h.hexdigest()
+
+
 @router.get("/health")
 def sam_health():
     """SAM service health check"""
@@ -62,6 +166,14 @@ def sam_health():
     }
 
 
+@router.post("/release")
+def release_sam_memory():
+    """Free SAM image embeddings (including the encoder feature cache) and cached GPU memory"""
+    model = get_sam_model()
+    model.release_memory()
+    return {"status": "released", "timestamp": time.time()}
+
+
 @router.post("/predict", response_model=SAMPredictionResponse)
 def predict_sam(request: SAMPredictionRequest):
     """Run SAM prediction"""
@@ -95,15 +207,34 @@ def predict_sam(request: SAMPredictionRequest):
         if request.boxes:
             boxes = [{"x1": b.x1, "y1": b.y1, "x2": b.x2, "y2": b.y2} for b in request.boxes]
         
-        logger.info(f"Calling SAM model predict_from_base64...")
+        cache_key = _get_cache_key(request)
+        cached_result = _cached_result(cache_key)
+        if cached_result is not None:
+            mask_base64, confidence = cached_result
+            logger.info(f"SAM prediction cache hit ({cache_key})")
+            return SAMPredictionResponse(
+                mask=mask_base64,
+                confidence=confidence,
+                processing_time=time.time() - start_time,
+                cached=True
+            )
+
+        logger.info(f"Calling SAM model predict_from_bytes...")
         
-        # Run prediction
-        mask_base64, confidence = model.predict_from_base64(
-            request.image_data,
-            request.prompt_type,
-            points,
-            boxes
-        )
+        # Run prediction (image already decoded while building the cache key)
+        _acquire_gpu_slot()
+        try:
+            mask_base64, confidence = model.predict_from_bytes(
+                request.get_image(),
+                request.prompt_type,
+                points,
+                boxes,
+                image_key=request.image_hash,
+            )
+        finally:
+            _GPU_SLOTS.release()
+
+        _cache_result(cache_key, mask_base64, confidence)
         
         processing_time = time.time() - start_time
         
@@ -126,9 +257,78 @@ def predict_sam(request: SAMPredictionRequest):
             cached=False
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"SAM prediction failed with exception: {e}")
         logger.error(f"Exception type: {type(e).__name__}")
         import traceback
         logger.error(f"Full traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+@router.post("/predict/batch", response_model=SAMBatchPredictionResponse)
+def predict_sam_batch(batch: SAMBatchPredictionRequest):
+    """
+    Run several SAM predictions in one call.
+
+    Cached requests are answered directly. The rest go through
+    SAMModel.predict_batch, which decodes images in parallel and encodes each
+    distinct image only once.
+    """
+    start_time = time.time()
+    logger.info(f"SAM batch prediction request received: {len(batch.requests)} requests")
+
+    try:
+        model = get_sam_model()
+
+        if not model.is_loaded():
+            logger.error("SAM model not loaded")
+            raise HTTPException(status_code=503, detail="SAM model not loaded")
+
+        results: List[Optional[SAMPredictionResponse]] = [None] * len(batch.requests)
+        pending = []
+        for i, request in enumerate(batch.requests):
+            cache_key = _get_cache_key(request)
+            cached_result = _cached_result(cache_key)
+            if cached_result is not None:
+                mask_base64, confidence = cached_result
+                results[i] = SAMPredictionResponse(
+                    mask=mask_base64, confidence=confidence, processing_time=0.0, cached=True
+                )
+            else:
+                pending.append((i, cache_key, request))
+
+        if pending:
+            _acquire_gpu_slot()
+            try:
+                predictions = model.predict_batch([
+                    (
+                        request.get_image(),
+                        request.prompt_type,
+                        [{"x": p.x, "y": p.y, "is_positive": p.is_positive} for p in request.points or []],
+                        [{"x1": b.x1, "y1": b.y1, "x2": b.x2, "y2": b.y2} for b in request.boxes or []],
+                    )
+                    for _, _, request in pending
+                ], image_keys=[request.image_hash for _, _, request in pending])
+            finally:
+                _GPU_SLOTS.release()
+            elapsed = time.time() - start_time
+            for (i, cache_key, _), (mask_base64, confidence) in zip(pending, predictions):
+                _cache_result(cache_key, mask_base64, confidence)
+                results[i] = SAMPredictionResponse(
+                    mask=mask_base64, confidence=confidence, processing_time=elapsed, cached=False
+                )
+
+        processing_time = time.time() - start_time
+        logger.info(
+            f"SAM batch prediction completed: {len(pending)} predicted, "
+            f"{len(batch.requests) - len(pending)} cached, {processing_time:.2f}s"
+        )
+        return SAMBatchPredictionResponse(results=results, processing_time=processing_time)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"SAM batch prediction failed with exception: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.db.database import get_db
+from app.services.lookup_cache import lookup_cache
 
 router = APIRouter()
 
@@ -169,6 +170,8 @@ def apply_template_to_project(
         added_count += 1
 
     db.commit()
+    # Categories may have been deleted and re-created under new ids
+    lookup_cache.invalidate(models.Category, project_id=project_id)
 
     return {
         "message": f"Template '{template.name}' applied to project",
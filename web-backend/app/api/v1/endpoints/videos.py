@@ -10,6 +10,7 @@ from app import crud, models, schemas
 from app.api import deps
 from app.core.config import settings
 from app.db.database import get_db
+from app.services.lookup_cache import lookup_cache
 
 router = APIRouter()
 
@@ -151,5 +152,6 @@ def delete_video(
     
     # Delete database record
     crud.video.remove(db=db, id=video_id)
+    lookup_cache.invalidate(models.Frame, video_id=video_id)
     
     return {"message": "Video deleted successfully"}
\ No newline at end of file
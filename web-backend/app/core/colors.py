@@ -0,0 +1,23 @@
+"""
+Default category colors.
+
+Colors are picked from the name with crc32 rather than hash()/random, so the
+same category gets the same color in every project, worker and restart.
+"""
+import zlib
+
+CATEGORY_COLORS = (
+    "#FF6B6B",
+    "#4ECDC4",
+    "#45B7D1",
+    "#96CEB4",
+    "#FFEAA7",
+    "#DDA0DD",
+    "#98D8C8",
+    "#F7DC6F",
+)
+
+
+def category_color(name: str) -> str:
+    """Deterministic palette color for a category name"""
+    return CATEGORY_COLORS[zlib.crc32(name.encode()) % len(CATEGORY_COLORS)]
@@ -0,0 +1,22 @@
+"""
+base64 helpers backed by pybase64's SIMD codec when it is installed.
+
+Drop-in for the stdlib functions of the same name; masks and images are
+multi-MB base64 payloads, where the SIMD decoder is several times faster.
+"""
+try:
+    import pybase64 as _base64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    import base64 as _base64
+    PYBASE64_AVAILABLE = False
+
+b64decode = _base64.b64decode
+b64encode = _base64.b64encode
+
+
+def b64encode_str(data: bytes) -> str:
+    """base64 text of data, without the intermediate bytes object when pybase64 is available"""
+    if PYBASE64_AVAILABLE:
+        return _base64.b64encode_as_string(data)
+    return _base64.b64encode(data).decode()
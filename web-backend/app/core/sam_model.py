@@ -1,18 +1,46 @@
-import base64
+import contextlib
+import hashlib
 import logging
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 from PIL import Image
 from ultralytics import SAM
 
+from app.core.fast_base64 import b64decode, b64encode_str
+
 logger = logging.getLogger(__name__)
 
 
+def _map_tensors(obj, fn):
+    """Apply fn to every tensor in a (possibly nested) features structure"""
+    if isinstance(obj, dict):
+        return {k: _map_tensors(v, fn) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_map_tensors(v, fn) for v in obj)
+    if hasattr(obj, "to"):
+        return fn(obj)
+    return obj
+
+
+def _to_pinned_host(tensor):
+    """Copy a tensor to page-locked host memory (plain host memory when it's already on CPU)"""
+    if tensor.device.type == "cpu":
+        return tensor
+    return tensor.to("cpu", non_blocking=False).pin_memory()
+
+
+def _is_out_of_memory(error: Exception) -> bool:
+    """True for CUDA out-of-memory errors (torch raises them as RuntimeError subclasses)"""
+    return isinstance(error, MemoryError) or "out of memory" in str(error).lower()
+
+
 class SAMModel:
     """
     Implementation of Segment Anything Model (SAM) integration using Ultralytics
@@ -32,6 +60,20 @@ class SAMModel:
         self.model = None
         self.lazy_load = lazy_load
 
+        # Free image embeddings and cached VRAM after every prediction (SAM_RELEASE_AFTER=1)
+        self.release_after = os.getenv("SAM_RELEASE_AFTER", "0") == "1"
+
+        # Largest group of requests predict_batch runs back to back on shared image features
+        self.max_batch_size = int(os.getenv("SAM_MAX_BATCH_SIZE", "8"))
+
+        # OPTIMIZATION: LRU of image-encoder outputs keyed by image digest, so repeated
+        # prompts on the same image skip the encoder (>90% of SAM latency). Entries evicted
+        # from the device tier are parked in pinned host memory and copied back on reuse.
+        self.feature_cache_size = int(os.getenv("SAM_FEATURE_CACHE_SIZE", "8"))
+        self.feature_host_cache_size = int(os.getenv("SAM_FEATURE_HOST_CACHE_SIZE", "32"))
+        self._feature_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._feature_host_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+
         # Track interaction state
         self.points = []
         self.labels = []
@@ -259,8 +301,29 @@ class SAMModel:
         logger.info(
             f"SAMModel: Final result mask shape: {result_mask.shape}, non-zero pixels: {np.count_nonzero(result_mask)}"
         )
+
+        if self.release_after:
+            self.release_memory()
+
         return result_mask
 
+    def release_memory(self):
+        """
+        Drop the predictor's cached image features and return cached CUDA blocks
+        to the driver. The next prediction re-encodes its image.
+        """
+        predictor = getattr(self.model, "predictor", None) if self.model is not None else None
+        if predictor is not None and hasattr(predictor, "features"):
+            predictor.features = None
+        self._feature_cache.clear()
+        self._feature_host_cache.clear()
+
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info("SAMModel: Released cached features and CUDA memory")
+
     def resize_frame(self, frame, target_width=640, target_height=480):
         """
         Resize frame to target dimensions while maintaining aspect ratio
@@ -325,18 +388,43 @@ class SAMModel:
             points (List[Dict]): List of point prompts with x, y, is_positive
             boxes (List[Dict]): List of box prompts with x1, y1, x2, y2
 
+        Returns:
+            tuple: (base64_mask, confidence)
+        """
+        logger.info(f"SAMModel: Starting prediction from base64...")
+        logger.info(f"SAMModel: Image data length: {len(image_data)}")
+        return self.predict_from_bytes(
+            b64decode(image_data), prompt_type, points, boxes
+        )
+
+    def predict_from_bytes(
+        self,
+        image_bytes: bytes,
+        prompt_type: str,
+        points: List[Dict] = None,
+        boxes: List[Dict] = None,
+        image_key: Optional[bytes] = None,
+    ):
+        """
+        Predict from already-decoded image file bytes (PNG/JPEG)
+
+        Args:
+            image_bytes (bytes): Encoded image file contents
+            prompt_type (str): Type of prompt ('point' or 'box')
+            points (List[Dict]): List of point prompts with x, y, is_positive
+            boxes (List[Dict]): List of box prompts with x1, y1, x2, y2
+            image_key (bytes): Optional image digest; enables the encoder feature cache
+
         Returns:
             tuple: (base64_mask, confidence)
         """
         try:
-            logger.info(f"SAMModel: Starting prediction from base64...")
-            logger.info(f"SAMModel: Image data length: {len(image_data)}")
+            logger.info(f"SAMModel: Image bytes length: {len(image_bytes)}")
             logger.info(f"SAMModel: Prompt type: {prompt_type}")
             logger.info(f"SAMModel: Points: {points}")
             logger.info(f"SAMModel: Boxes: {boxes}")
 
             # Decode image
-            image_bytes = base64.b64decode(image_data)
             pil_image = Image.open(BytesIO(image_bytes))
             image_array = np.array(pil_image)
 
@@ -366,7 +454,8 @@ class SAMModel:
 
             # Run prediction on RESIZED frame (like Streamlit)
             logger.info(f"SAMModel: Calling predict method with resized frame...")
-            mask = self.predict(resized_frame, prompt_type, point_list, box_list)
+            with self._image_features(resized_frame, image_key):
+                mask = self.predict(resized_frame, prompt_type, point_list, box_list)
 
             logger.info(f"SAMModel: Prediction completed")
             logger.info(f"SAMModel: Mask shape: {mask.shape}")
@@ -405,8 +494,9 @@ class SAMModel:
                 )
 
             buffer = BytesIO()
-            mask_image.save(buffer, format="PNG")
-            mask_base64 = base64.b64encode(buffer.getvalue()).decode()
+            # Binary masks: fast deflate is nearly as small as the default level
+            mask_image.save(buffer, format="PNG", compress_level=1)
+            mask_base64 = b64encode_str(buffer.getvalue())
 
             logger.info(f"SAMModel: Encoded mask as base64, length: {len(mask_base64)}")
             logger.info(f"SAMModel: Base64 preview: {mask_base64[:50]}...")
@@ -427,10 +517,151 @@ class SAMModel:
             mask_image = Image.fromarray(empty_mask, mode="L")
             buffer = BytesIO()
             mask_image.save(buffer, format="PNG")
-            mask_base64 = base64.b64encode(buffer.getvalue()).decode()
+            mask_base64 = b64encode_str(buffer.getvalue())
             logger.info(f"SAMModel: Empty mask base64 length: {len(mask_base64)}")
             return mask_base64, 0.0
 
+    def predict_batch(
+        self,
+        requests: List[Tuple[bytes, str, List[Dict], List[Dict]]],
+        image_keys: Optional[List[bytes]] = None,
+    ):
+        """
+        Predict several (image_bytes, prompt_type, points, boxes) requests at once
+
+        image_keys optionally gives each request's image digest (used for grouping
+        and the feature cache); otherwise images are hashed here.
+
+        Images are decoded concurrently, and requests sharing an image run back to
+        back on a single image-encoder pass (SAM's encoder dominates the cost; the
+        prompt decoder is cheap). If a group runs out of GPU memory, its
+        requests fall back to independent predictions.
+
+        Returns:
+            list: (base64_mask, confidence) per request, in request order
+        """
+        if not requests:
+            return []
+
+        if self.model is None and self.lazy_load:
+            self._load_model()
+
+        logger.info(f"SAMModel: Batch prediction for {len(requests)} requests")
+
+        # OPTIMIZATION: PIL decode and cv2 resize release the GIL, so images decode in parallel
+        with ThreadPoolExecutor(max_workers=min(len(requests), os.cpu_count() or 4)) as pool:
+            frames = list(pool.map(self._prepare_image, [r[0] for r in requests]))
+
+        # Group requests by image content so each distinct image is encoded once
+        groups: Dict[bytes, List[int]] = {}
+        for i, (image_bytes, _, _, _) in enumerate(requests):
+            if image_keys is not None:
+                key = image_keys[i]
+            else:
+                key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+            groups.setdefault(key, []).append(i)
+
+        results: List[Optional[Tuple[str, float]]] = [None] * len(requests)
+        for key, idxs in groups.items():
+            for start in range(0, len(idxs), self.max_batch_size):
+                chunk = idxs[start : start + self.max_batch_size]
+                try:
+                    with self._image_features(frames[chunk[0]], key):
+                        for i in chunk:
+                            results[i] = self._predict_prepared(frames[i], *requests[i][1:])
+                except Exception as e:
+                    if not _is_out_of_memory(e):
+                        raise
+                    logger.warning(f"SAMModel: Batch ran out of memory ({e}), predicting individually")
+                    self.release_memory()
+                    for i in chunk:
+                        results[i] = self._predict_prepared(frames[i], *requests[i][1:])
+
+        if self.release_after:
+            self.release_memory()
+
+        return results
+
+    @contextlib.contextmanager
+    def _image_features(self, image: np.ndarray, key: Optional[bytes] = None):
+        """
+        Load image's encoder output onto the Ultralytics predictor so predictions
+        inside the block reuse it, then detach it again
+
+        With a key, the features come from (and are stored in) the feature cache,
+        so the encoder only runs on a miss.
+        """
+        predictor = getattr(self.model, "predictor", None) if self.model is not None else None
+        if predictor is None or not hasattr(predictor, "set_image"):
+            yield
+            return
+
+        features = self._cached_features(key) if key is not None else None
+        if features is not None:
+            predictor.features = features
+        else:
+            predictor.set_image(image)
+            if key is not None and self.feature_cache_size > 0:
+                self._store_features(key, predictor.features)
+        try:
+            yield
+        finally:
+            predictor.reset_image()
+
+    def _cached_features(self, key: bytes):
+        """Look up cached encoder features, promoting host-parked entries back to the device"""
+        features = self._feature_cache.get(key)
+        if features is not None:
+            self._feature_cache.move_to_end(key)
+            return features
+
+        features = self._feature_host_cache.pop(key, None)
+        if features is None:
+            return None
+        device = getattr(self.model.predictor, "device", None)
+        features = _map_tensors(features, lambda t: t.to(device, non_blocking=True))
+        self._store_features(key, features)
+        return features
+
+    def _store_features(self, key: bytes, features):
+        """Insert into the device LRU, parking the evicted entry in pinned host memory"""
+        self._feature_cache[key] = features
+        self._feature_cache.move_to_end(key)
+        while len(self._feature_cache) > self.feature_cache_size:
+            evicted_key, evicted = self._feature_cache.popitem(last=False)
+            if self.feature_host_cache_size <= 0:
+                continue
+            self._feature_host_cache[evicted_key] = _map_tensors(evicted, _to_pinned_host)
+            if len(self._feature_host_cache) > self.feature_host_cache_size:
+                self._feature_host_cache.popitem(last=False)
+
+    def _predict_prepared(self, frame, prompt_type, points, boxes):
+        """Run predict on an already decoded 640x480 frame and encode the mask"""
+        point_list = [(p["x"], p["y"], p["is_positive"]) for p in points or []]
+        box_list = [(b["x1"], b["y1"], b["x2"], b["y2"]) for b in boxes or []]
+        release_after, self.release_after = self.release_after, False
+        try:
+            mask = self.predict(frame, prompt_type, point_list, box_list)
+        finally:
+            self.release_after = release_after
+        return self._mask_to_base64(mask), 0.8
+
+    def _prepare_image(self, image_bytes: bytes) -> np.ndarray:
+        """Decode image file bytes and letterbox them to the 640x480 processing size"""
+        pil_image = Image.open(BytesIO(image_bytes))
+        return self.resize_frame(np.array(pil_image), 640, 480)
+
+    def _mask_to_base64(self, mask: np.ndarray) -> str:
+        """Encode a 0/1 mask as a base64 PNG, forcing the 640x480 processing size"""
+        if mask.shape != (480, 640):
+            logger.error(f"Invalid mask shape: {mask.shape}, expected (480, 640)")
+            mask = cv2.resize(mask.astype(np.uint8), (640, 480), interpolation=cv2.INTER_NEAREST)
+        mask_image = Image.fromarray((mask * 255).astype(np.uint8), mode="L")
+        buffer = BytesIO()
+        # Binary masks: fast deflate is nearly as small as the default level
+        mask_image.save(buffer, format="PNG", compress_level=1)
+        return b64encode_str(buffer.getvalue())
+
     def get_contours(self):
         """
         Get the contours of the segmented image
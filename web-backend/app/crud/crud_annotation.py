@@ -1,8 +1,10 @@
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from app.crud.base import CRUDBase
-from app.models.models import Annotation
+from app.models.models import Annotation, Frame
 from app.schemas.schemas import AnnotationCreate, AnnotationBase
 
 
@@ -18,6 +20,39 @@ class CRUDAnnotation(CRUDBase[Annotation, AnnotationCreate, AnnotationBase]):
             .all()
         )
 
+    async def get_async(self, db: AsyncSession, id: int) -> Optional[Annotation]:
+        return await db.get(self.model, id)
+
+    async def get_by_frame_async(
+        self, db: AsyncSession, *, frame_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Annotation]:
+        result = await db.execute(
+            select(self.model)
+            .filter(Annotation.frame_id == frame_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_by_video_frame_async(
+        self, db: AsyncSession, *, video_id: int, frame_number: int, skip: int = 0, limit: int = 100
+    ) -> List[Annotation]:
+        """
+        Annotations of a video frame with their categories, in two queries.
+
+        The frame is joined rather than looked up first, and categories come from a
+        single selectinload IN query (async sessions can't lazy-load them per row).
+        """
+        result = await db.execute(
+            select(self.model)
+            .join(Frame, Frame.id == Annotation.frame_id)
+            .options(selectinload(Annotation.category))
+            .filter(Frame.video_id == video_id, Frame.frame_number == frame_number)
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
     def create_with_frame(
         self, db: Session, *, obj_in: AnnotationCreate, frame_id: int, 
         mask_storage_key: str, mask_width: int = None, mask_height: int = None
@@ -1,12 +1,45 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+_POOL_OPTIONS = dict(
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_use_lifo=True,
+)
+
+# Each engine has its own pool, so the connection budget is split between them
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_SYNC_POOL_SIZE,
+    max_overflow=settings.DB_SYNC_MAX_OVERFLOW,
+    **_POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """Same database through the asyncpg driver"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    **_POOL_OPTIONS,
+)
+# expire_on_commit=False: async sessions can't lazy-load attributes expired by a commit
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -15,4 +48,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
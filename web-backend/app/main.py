@@ -20,6 +20,33 @@ logger = logging.getLogger(__name__)
 models.Base.metadata.create_all(bind=engine)
 
 
+def ensure_lookup_indexes():
+    """
+    Add indexes declared after a table was first created.
+
+    create_all() skips existing tables, so databases created before the unique
+    frame/category indexes or the foreign key indexes existed get them here.
+    """
+    for model in (
+        models.Project,
+        models.Video,
+        models.Frame,
+        models.Category,
+        models.Annotation,
+        models.TemplateCategoryItem,
+    ):
+        table = model.__table__
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                # Most likely duplicate rows from before the index existed
+                logger.warning(f"Could not create index {index.name}: {e}")
+
+
+ensure_lookup_indexes()
+
+
 def seed_system_templates():
     """Seed system category templates if they don't exist"""
     db = SessionLocal()
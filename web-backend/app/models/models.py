@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -26,7 +26,7 @@ class Project(Base):
     display_name = Column(String, nullable=False)  # User-provided display name
     description = Column(Text, nullable=True)
     annotation_format = Column(String, nullable=False, default='YOLO')  # YOLO, COCO, PASCAL_VOC
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -39,7 +39,7 @@ class Video(Base):
     __tablename__ = "videos"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
@@ -68,6 +68,11 @@ class Frame(Base):
     video = relationship("Video", back_populates="frames")
     annotations = relationship("Annotation", back_populates="frame", cascade="all, delete-orphan")
 
+    # One row per video frame; also the index behind get_or_create_frame's lookup
+    __table_args__ = (
+        Index("ix_frames_video_id_frame_number", "video_id", "frame_number", unique=True),
+    )
+
 
 class Category(Base):
     __tablename__ = "categories"
@@ -81,13 +86,18 @@ class Category(Base):
     project = relationship("Project", back_populates="categories")
     annotations = relationship("Annotation", back_populates="category")
 
+    # Category names are unique per project; also the index behind get_or_create_category's lookup
+    __table_args__ = (
+        Index("ix_categories_project_id_name", "project_id", "name", unique=True),
+    )
+
 
 class Annotation(Base):
     __tablename__ = "annotations"
 
     id = Column(Integer, primary_key=True, index=True)
-    frame_id = Column(Integer, ForeignKey("frames.id"), nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    frame_id = Column(Integer, ForeignKey("frames.id"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
     mask_storage_key = Column(String, nullable=False)  # Object storage key for mask
     annotation_storage_key = Column(String, nullable=True)  # Object storage key for annotation file
     sam_points = Column(Text, nullable=True)  # JSON string of SAM prompt points
@@ -125,7 +135,7 @@ class TemplateCategoryItem(Base):
     __tablename__ = "template_category_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    template_id = Column(Integer, ForeignKey("category_templates.id"), nullable=False)
+    template_id = Column(Integer, ForeignKey("category_templates.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     color = Column(String, nullable=False)
     order = Column(Integer, default=0)  # For ordering categories in UI
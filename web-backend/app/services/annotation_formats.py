@@ -2,12 +2,14 @@
 Annotation format converters for different training formats (YOLO, COCO, Pascal VOC)
 """
 import json
-import base64
 import io
-from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Optional, Union
 from PIL import Image
 from datetime import datetime
 
+from app.core.fast_base64 import b64decode
+
 try:
     import numpy as np
     import cv2
@@ -16,6 +18,23 @@ except ImportError:
     DEPENDENCIES_AVAILABLE = False
 
 
+def decode_mask_data(mask_data: Union[str, bytes]) -> bytes:
+    """PNG bytes from a base64 string / data URL; raw bytes are returned unchanged"""
+    if isinstance(mask_data, bytes):
+        return mask_data
+    if mask_data.startswith('data:image'):
+        mask_data = mask_data.split(',')[1]
+    return b64decode(mask_data)
+
+
+@dataclass(slots=True)
+class FormatData:
+    """The fields of an annotation the converters read"""
+    category_id: int
+    mask_data: Union[str, bytes]
+    category_name: str = 'object'
+
+
 class AnnotationFormatConverter:
     """Base class for annotation format converters"""
     
@@ -23,30 +42,24 @@ class AnnotationFormatConverter:
         self.image_width = image_width
         self.image_height = image_height
     
-    def mask_to_polygon(self, mask_data: str) -> List[List[int]]:
-        """Convert base64 mask to polygon coordinates"""
+    def mask_to_polygon(self, mask_data: Union[str, bytes]) -> List[List[int]]:
+        """Convert base64 (or raw PNG) mask to polygon coordinates"""
         if not DEPENDENCIES_AVAILABLE:
             print("Warning: numpy/cv2 not available - using fallback polygon generation")
             return self._fallback_polygon_from_mask(mask_data)
             
         try:
-            # Decode base64 mask
-            if mask_data.startswith('data:image'):
-                mask_data = mask_data.split(',')[1]
+            mask_bytes = decode_mask_data(mask_data)
             
-            mask_bytes = base64.b64decode(mask_data)
-            
-            # Convert to PIL Image and then numpy array
-            mask_image = Image.open(io.BytesIO(mask_bytes))
-            mask_array = np.array(mask_image)
-            
-            # Convert to binary mask (handle both grayscale and RGB)
-            if len(mask_array.shape) == 3:
-                # If RGB, convert to grayscale
-                mask_array = np.dot(mask_array[...,:3], [0.2989, 0.5870, 0.1140])
+            # OPTIMIZATION: decode straight to one uint8 channel (any PNG color
+            # type) and threshold in place, instead of PIL -> array -> float
+            # luminance dot -> compare -> astype, each a full pass over the mask
+            mask_array = cv2.imdecode(np.frombuffer(mask_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if mask_array is None:
+                raise ValueError("could not decode mask image")
             
             # Threshold to binary
-            binary_mask = (mask_array > 128).astype(np.uint8) * 255
+            _, binary_mask = cv2.threshold(mask_array, 128, 255, cv2.THRESH_BINARY)
             
             # Find contours
             contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -71,14 +84,11 @@ class AnnotationFormatConverter:
             print(f"Error converting mask to polygon: {e}")
             return self._fallback_polygon_from_mask(mask_data)
     
-    def _fallback_polygon_from_mask(self, mask_data: str) -> List[List[int]]:
+    def _fallback_polygon_from_mask(self, mask_data: Union[str, bytes]) -> List[List[int]]:
         """Fallback polygon generation when cv2/numpy not available"""
         try:
             # Simple bounding box approximation using PIL only
-            if mask_data.startswith('data:image'):
-                mask_data = mask_data.split(',')[1]
-            
-            mask_bytes = base64.b64decode(mask_data)
+            mask_bytes = decode_mask_data(mask_data)
             mask_image = Image.open(io.BytesIO(mask_bytes))
             
             # Get image dimensions
@@ -103,10 +113,17 @@ class AnnotationFormatConverter:
             # Return minimal valid polygon
             return [[100, 100, 200, 100, 200, 200, 100, 200]]
     
-    def mask_to_bbox(self, mask_data: str) -> Optional[List[int]]:
-        """Convert base64 mask to bounding box [x, y, width, height]"""
+    def mask_to_bbox(self, mask_data: Union[str, bytes],
+                     polygons: Optional[List[List[int]]] = None) -> Optional[List[int]]:
+        """
+        Convert base64 (or raw PNG) mask to bounding box [x, y, width, height].
+
+        Pass polygons already computed by mask_to_polygon() to skip decoding
+        and tracing the mask a second time.
+        """
         try:
-            polygons = self.mask_to_polygon(mask_data)
+            if polygons is None:
+                polygons = self.mask_to_polygon(mask_data)
             if not polygons:
                 return None
             
@@ -140,15 +157,15 @@ class AnnotationFormatConverter:
 class YOLOConverter(AnnotationFormatConverter):
     """Convert annotations to YOLO format"""
     
-    def convert(self, annotation_data: Dict[str, Any]) -> str:
+    def convert(self, annotation_data: FormatData) -> str:
         """
         Convert annotation to YOLO format string
         Format: class_id center_x center_y width height
         Coordinates are normalized (0-1)
         """
         try:
-            category_id = annotation_data.get('category_id', 0)
-            mask_data = annotation_data.get('mask_data', '')
+            category_id = annotation_data.category_id
+            mask_data = annotation_data.mask_data
             
             if not mask_data:
                 return ""
@@ -181,20 +198,20 @@ class COCOConverter(AnnotationFormatConverter):
         super().__init__(image_width, image_height)
         self.annotation_id = 1
     
-    def convert(self, annotation_data: Dict[str, Any], image_id: int = 1) -> Dict[str, Any]:
+    def convert(self, annotation_data: FormatData, image_id: int = 1) -> Dict[str, Any]:
         """
         Convert annotation to COCO format dict
         """
         try:
-            category_id = annotation_data.get('category_id', 1)
-            mask_data = annotation_data.get('mask_data', '')
+            category_id = annotation_data.category_id
+            mask_data = annotation_data.mask_data
             
             if not mask_data:
                 return {}
             
             # Get polygon and bounding box
             polygons = self.mask_to_polygon(mask_data)
-            bbox = self.mask_to_bbox(mask_data)
+            bbox = self.mask_to_bbox(mask_data, polygons)
             
             if not polygons or not bbox:
                 return {}
@@ -246,13 +263,13 @@ class COCOConverter(AnnotationFormatConverter):
 class PascalVOCConverter(AnnotationFormatConverter):
     """Convert annotations to Pascal VOC XML format"""
     
-    def convert(self, annotation_data: Dict[str, Any], image_filename: str) -> str:
+    def convert(self, annotation_data: FormatData, image_filename: str) -> str:
         """
         Convert annotation to Pascal VOC XML format string
         """
         try:
-            category_name = annotation_data.get('category_name', 'object')
-            mask_data = annotation_data.get('mask_data', '')
+            category_name = annotation_data.category_name
+            mask_data = annotation_data.mask_data
             
             if not mask_data:
                 return ""
@@ -301,30 +318,44 @@ class PascalVOCConverter(AnnotationFormatConverter):
 
 
 class AnnotationFormatService:
-    """Service to handle different annotation formats"""
+    """
+    Service to handle different annotation formats.
+
+    Stateless after construction, so the module instance is safe to share
+    between concurrent requests: image size is passed to each call, and the
+    constructor values are only defaults.
+    """
+
+    # Converter classes by format name
+    CONVERTERS = {
+        'YOLO': YOLOConverter,
+        'COCO': COCOConverter,
+        'PASCAL_VOC': PascalVOCConverter
+    }
     
     def __init__(self, image_width: int = 640, image_height: int = 480):
-        self.image_width = image_width
-        self.image_height = image_height
+        self.default_image_width = image_width
+        self.default_image_height = image_height
     
-    def get_converter(self, format_type: str):
-        """Get the appropriate converter for the format"""
-        converters = {
-            'YOLO': YOLOConverter,
-            'COCO': COCOConverter,
-            'PASCAL_VOC': PascalVOCConverter
-        }
-        
-        converter_class = converters.get(format_type.upper())
+    def get_converter(self, format_type: str, *, image_width: Optional[int] = None,
+                      image_height: Optional[int] = None):
+        """Get a fresh converter for the format, sized to the given image (or the defaults)"""
+        converter_class = self.CONVERTERS.get(format_type.upper())
         if not converter_class:
             raise ValueError(f"Unsupported format: {format_type}")
         
-        return converter_class(self.image_width, self.image_height)
+        return converter_class(
+            image_width or self.default_image_width,
+            image_height or self.default_image_height,
+        )
     
-    def convert_annotation(self, annotation_data: Dict[str, Any], format_type: str, 
+    def convert_annotation(self, annotation_data: FormatData, format_type: str, *,
+                         image_width: Optional[int] = None, image_height: Optional[int] = None,
                          **kwargs) -> str:
-        """Convert annotation to specified format"""
-        converter = self.get_converter(format_type)
+        """Convert annotation to specified format for an image_width x image_height image"""
+        converter = self.get_converter(
+            format_type, image_width=image_width, image_height=image_height
+        )
         
         if format_type.upper() == 'COCO':
             # COCO returns dict, need to serialize
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple, Type
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+
+class LookupCache:
+    """
+    Process-local LRU of small, rarely changing rows (frames, categories).
+
+    Only column values are cached, never ORM instances, so entries can be
+    shared between sessions and threads. A hit is re-attached to the caller's
+    session with merge(load=False), which costs no SELECT.
+
+    invalidate() only reaches this process, so entries also expire after ttl
+    seconds; that bounds how long other workers can serve a renamed/deleted row.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _detached(self, model: Type, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+        instance = model(**values)
+        make_transient_to_detached(instance)
+        return instance
+
+    def get(self, db: Session, model: Type, key: Hashable) -> Optional[Any]:
+        """Return a session-bound instance of model for key, or None on a miss"""
+        instance = self._detached(model, key)
+        return None if instance is None else db.merge(instance, load=False)
+
+    async def get_async(self, db: AsyncSession, model: Type, key: Hashable) -> Optional[Any]:
+        """get() for an AsyncSession"""
+        instance = self._detached(model, key)
+        return None if instance is None else await db.merge(instance, load=False)
+
+    def put(self, key: Hashable, instance: Any):
+        """Remember the column values of a persisted instance"""
+        if self.max_size <= 0:
+            return
+        values = {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, model: Optional[Type] = None, **filters):
+        """
+        Drop entries of model whose values match filters (everything if no model).
+
+        Call after renaming/deleting rows outside get_or_create_*, e.g.
+        invalidate(models.Category, project_id=1) or invalidate(models.Frame, video_id=3).
+        """
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+                return
+            stale = [
+                key for key, (_, values) in self._entries.items()
+                if key[0] == model.__name__
+                and all(values.get(name) == value for name, value in filters.items())
+            ]
+            for key in stale:
+                del self._entries[key]
+
+
+# Frames and categories are keyed by (model name, natural key...), see annotations.get_or_create_*
+lookup_cache = LookupCache(
+    int(os.getenv("LOOKUP_CACHE_SIZE", "4096")),
+    float(os.getenv("LOOKUP_CACHE_TTL", "300")),
+)
@@ -1,10 +1,11 @@
-import base64
 import io
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Union
 
 from app.core.config import settings
+from app.core.fast_base64 import b64decode
 from minio import Minio
 from minio.error import S3Error
 
@@ -16,6 +17,11 @@ class StorageService:
         self.client = self._create_client()
         self.bucket_name = self._get_bucket_name()
         self._ensure_bucket_exists()
+        # Runs the second PUT of store_mask_and_annotation alongside the first
+        self._upload_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MINIO_UPLOAD_WORKERS", "8")),
+            thread_name_prefix="minio-upload",
+        )
 
     def _create_client(self) -> Minio:
         """Create MinIO client from environment variables"""
@@ -51,7 +57,7 @@ class StorageService:
         video_id: int,
         frame_number: int,
         annotation_id: int,
-        mask_data: str,
+        mask_data: Union[str, bytes],
     ) -> str:
         """
         Store mask data in object storage
@@ -61,7 +67,7 @@ class StorageService:
             video_id: ID of the video
             frame_number: Frame number
             annotation_id: ID of the annotation
-            mask_data: Base64 encoded mask image data
+            mask_data: Base64 encoded mask image data, or raw PNG bytes
 
         Returns:
             Object key/path in storage
@@ -70,12 +76,16 @@ class StorageService:
             # Create object key with hierarchical structure
             object_key = f"projects/{project_id}/videos/{video_id}/frames/{frame_number}/annotations/{annotation_id}/mask.png"
 
-            # Decode base64 mask data
-            if mask_data.startswith("data:image"):
-                # Remove data URL prefix if present
-                mask_data = mask_data.split(",")[1]
+            if isinstance(mask_data, bytes):
+                # Raw PNG upload, nothing to decode
+                mask_bytes = mask_data
+            else:
+                # Decode base64 mask data
+                if mask_data.startswith("data:image"):
+                    # Remove data URL prefix if present
+                    mask_data = mask_data.split(",")[1]
 
-            mask_bytes = base64.b64decode(mask_data)
+                mask_bytes = b64decode(mask_data)
 
             # Upload to storage
             self.client.put_object(
@@ -136,6 +146,36 @@ class StorageService:
             print(f"Error retrieving mask data: {e}")
             raise
 
+    def open_mask_stream(self, object_key: str):
+        """
+        Open a mask object for streaming without reading its body
+
+        Args:
+            object_key: Object key/path in storage
+
+        Returns:
+            The raw MinIO response; pass it to iter_mask() to consume it
+        """
+        try:
+            return self.client.get_object(
+                bucket_name=self.bucket_name, object_name=object_key
+            )
+        except Exception as e:
+            print(f"Error opening mask stream: {e}")
+            raise
+
+    @staticmethod
+    def iter_mask(response, chunk_size: int = 65536):
+        """
+        Yield a response from open_mask_stream() in chunk_size pieces,
+        releasing the connection when done (or when the client goes away)
+        """
+        try:
+            yield from response.stream(chunk_size)
+        finally:
+            response.close()
+            response.release_conn()
+
     def delete_mask(self, object_key: str) -> bool:
         """
         Delete mask from object storage
@@ -265,7 +305,7 @@ class StorageService:
         video_id: int,
         frame_number: int,
         annotation_id: int,
-        mask_data: str,
+        mask_data: Union[str, bytes],
         annotation_content: str,
         format_type: str,
     ) -> dict:
@@ -277,7 +317,7 @@ class StorageService:
             video_id: ID of the video
             frame_number: Frame number
             annotation_id: ID of the annotation
-            mask_data: Base64 encoded mask image data
+            mask_data: Base64 encoded mask image data, or raw PNG bytes
             annotation_content: Formatted annotation content
             format_type: Annotation format type
 
@@ -285,13 +325,11 @@ class StorageService:
             Dict with both storage keys
         """
         try:
-            # Store mask
-            mask_key = self.store_mask(
-                project_id, video_id, frame_number, annotation_id, mask_data
-            )
-
-            # Store annotation
-            annotation_key = self.store_annotation(
+            # OPTIMIZATION: the two PUTs are independent, so the annotation file
+            # uploads on the pool while the mask uploads on this thread (latency is
+            # the slower of the two, not the sum). The Minio client is thread-safe.
+            annotation_future = self._upload_pool.submit(
+                self.store_annotation,
                 project_id,
                 video_id,
                 frame_number,
@@ -300,6 +338,22 @@ class StorageService:
                 format_type,
             )
 
+            try:
+                # Store mask
+                mask_key = self.store_mask(
+                    project_id, video_id, frame_number, annotation_id, mask_data
+                )
+            except Exception:
+                # Don't leave the annotation upload running past a failure, and
+                # don't orphan its object if it landed before the mask PUT failed
+                wait([annotation_future])
+                if annotation_future.exception() is None:
+                    self.delete_mask(annotation_future.result())
+                raise
+
+            # Store annotation
+            annotation_key = annotation_future.result()
+
             return {
                 "mask_storage_key": mask_key,
                 "annotation_storage_key": annotation_key,